@@ -6,7 +6,6 @@ Gestisce l'elaborazione immagini e l'interfaccia grafica per la centratura dei f
 # Standard library imports
 import sys
 import os
-import json
 import time
 import logging
 import signal
@@ -15,10 +14,12 @@ import atexit
 import threading
 from datetime import datetime
 from functools import partial
-from queue import Queue
+from collections import deque
+from queue import Queue, Empty
 
 # Third-party imports
 import cv2
+import numpy as np
 import tkinter as tk
 import PIL
 from PIL import ImageTk
@@ -28,17 +29,25 @@ import fari_detection
 from funcs_misc import (
     preprocess,
     visualizza_croce_riferimento,
+    segmenti_croce_riferimento,
     blur_and_sharpen,
     sharpen_dog,
     sharpen_bandlimited,
-    is_punto_ok
+    is_punto_ok,
+    fuse_gray_jet,
+    JET_LUT
 )
 from funcs_anabbagliante import rileva_punto_angoloso, rileva_punto_angoloso1
-from funcs_luminosita import calcola_px_lux
+from funcs_luminosita import calcola_px_lux, compute_lux_offsets
 from camera import set_camera, apri_camera, autoexp
-from comms import thread_comunicazione
-from utils import uccidi_processo, get_colore, disegna_segmento
+from comms import thread_comunicazione, init_tx_dato, pubblica_dato
+from utils import (
+    uccidi_processo, get_colore, disegna_segmento, disegna_segmenti, disegna_segmenti_planare,
+    metti_ultimo, buffer_rotante, carica_json,
+    NUMBA_DISPONIBILE
+)
 from calibrazione import CalibrationManager
+from frame_shm import leggi_frame, frame_valido
 
 
 def init_config(config_path, cache, percorso_script):
@@ -53,8 +62,7 @@ def init_config(config_path, cache, percorso_script):
     filepath = os.path.join(percorso_script, config_path)
     logging.info(f"Caricamento configurazione da {config_path}")
 
-    with open(filepath, "r") as f:
-        config = json.load(f)
+    config = carica_json(filepath)
 
     # Aggiorna cache
     cache["config"] = config
@@ -68,47 +76,173 @@ def init_config(config_path, cache, percorso_script):
         logging.DEBUG if config.get("DEBUG", False) else logging.INFO
     )
 
+    # Geometria croce da ricalcolare (width/height/TOH/TOV possono essere cambiati)
+    cache["croce_dirty"] = True
+
     logging.info(f"Configurazione caricata da {config_path}")
 
 
-def show_frame(cache, lmain):
+def thread_config(cache, intervallo=1.0):
+    """
+    Controlla una volta al secondo se config.json è stato modificato e in tal
+    caso imposta cache['config_dirty']; il ricaricamento avviene nel thread
+    di acquisizione, così il ciclo frame non fa stat ad ogni frame.
+
+    Args:
+        cache: Dizionario cache
+        intervallo: Periodo di controllo (s)
+    """
+    config_file = os.path.join(cache['percorso_script'], 'config.json')
+    while True:
+        try:
+            mtime = os.path.getmtime(config_file)
+            if mtime != cache.get('config_mtime', 0):
+                # Al primo giro registra solo l'mtime della config già caricata
+                if 'config_mtime' in cache:
+                    cache['config_dirty'] = True
+                cache['config_mtime'] = mtime
+        except Exception as e:
+            logging.error(f"Errore controllo config: {e}")
+        time.sleep(intervallo)
+
+
+def _imposta_affinita(cache, nome):
+    """
+    Vincola il thread chiamante ai core indicati in config['cpu_affinity'][nome]
+    (es. {"acquisizione": [1], "elaborazione": [2, 3]}), se presenti.
+    """
+    cores = cache['config'].get('cpu_affinity', {}).get(nome)
+    if not cores:
+        return
     try:
-        _show_frame_impl(cache, lmain)
-    except Exception:
-        logging.error("Errore show_frame", exc_info=True)
-    finally:
-        lmain.after(5, lambda: show_frame(cache, lmain))
+        os.sched_setaffinity(0, cores)
+        logging.info(f"Thread {nome} vincolato ai core {cores}")
+    except (AttributeError, OSError, ValueError) as e:
+        logging.error(f"Errore affinità thread {nome}: {e}")
+
+
+# Costanti OpenCV usate nel ciclo frame
+_BGR2GRAY = cv2.COLOR_BGR2GRAY
+_FONT_DEBUG = cv2.FONT_HERSHEY_COMPLEX_SMALL
+_COL_GREEN = get_colore('green')
+_COL_RED = get_colore('red')
+_DETECTORS_GET = fari_detection.DETECTORS.get
+
+# Statistiche tempi per stadio (solo con DEBUG): log p50/p95 ogni _N_TEMPI frame
+_N_TEMPI = 300
+_STADI = ('lettura', 'preprocess', 'coda', 'detect', 'lux')
+
+
+def _parametri_lux(cache, config):
+    """
+    Ritorna (lux_size, (sft_x, sft_y)) per la config corrente.
+
+    Calcolati una sola volta per ogni config caricata (init_config sostituisce
+    cache['config'], quindi basta confrontare l'identità del dict).
+    """
+    cached = cache.get('parametri_lux')
+    if cached is None or cached[0] is not config:
+        lux_size = (config['lux_w'], config['lux_h'])
+        lux_sft = compute_lux_offsets(
+            float(config['lux_sft_x']), float(config['lux_sft_y']),
+            float(config['crop_w']), float(config['crop_h'])
+        )
+        cached = (config, lux_size, lux_sft)
+        cache['parametri_lux'] = cached
+    return cached[1], cached[2]
+
+
+def _geometria_croce(cache):
+    """
+    Segmenti della croce di riferimento ({'croce': [...], 'fendinebbia': [...]}),
+    ricalcolati solo quando comms o init_config impostano cache['croce_dirty'].
+
+    Il ricalcolo legge lo stato corrente (non lo snapshot del frame): il flag
+    viene impostato dopo l'aggiornamento, quindi la geometria in cache
+    corrisponde sempre agli ultimi valori ricevuti.
+    """
+    if cache.pop('croce_dirty', False) or 'croce_geom' not in cache:
+        config = cache['config']
+        stato = cache['stato_comunicazione']
+        width = config['width']
+        center_x = int(width / 2)
+        center_y = int(config['height'] / 2) + stato.get('incl', 0)
+        toh = stato.get('TOH', config.get('TOH', 50))
+        tov = stato.get('TOV', config.get('TOV', 50))
+        tov_fendinebbia = config.get('TOV', 50)
+
+        y_top = center_y - tov_fendinebbia
+        y_bottom = center_y + tov_fendinebbia
+        cache['croce_geom'] = {
+            'croce': segmenti_croce_riferimento(center_x, center_y, 2 * tov, 2 * toh),
+            'fendinebbia': [((0, y_top), (width, y_top)), ((0, y_bottom), (width, y_bottom))],
+        }
+    return cache['croce_geom']
+
+
+def _registra_tempi(cache, tempi):
+    """
+    Accumula i tempi di un frame (s, nell'ordine di _STADI) e ogni _N_TEMPI
+    frame logga p50/p95 in ms per stadio, per il display (thread Tk) e la
+    profondità delle code della pipeline. Chiamata solo con cache['DEBUG'].
+    """
+    storico = cache.get('tempi_stadi')
+    if storico is None:
+        storico = cache['tempi_stadi'] = deque(maxlen=_N_TEMPI)
+    storico.append(tempi)
+    if len(storico) < _N_TEMPI:
+        return
+
+    p50, p95 = np.percentile(np.array(storico) * 1000, (50, 95), axis=0)
+    storico.clear()
+    parti = [f"{nome} {a:.1f}/{b:.1f}" for nome, a, b in zip(_STADI, p50, p95)]
+
+    tempi_display = cache.get('tempi_display')
+    if tempi_display:
+        d50, d95 = np.percentile(np.array(tempi_display) * 1000, (50, 95))
+        parti.append(f"display {d50:.1f}/{d95:.1f}")
+
+    logging.debug("Tempi stadi p50/p95 ms: %s | coda_frame %d, coda_display %d",
+                  ", ".join(parti), cache['coda_frame'].qsize(), cache['coda_display'].qsize())
+
+
+def show_frame(cache, lmain, periodo_ms=16):
+    """
+    Avvia il ciclo di visualizzazione: un'unica callback _tick, creata una
+    volta sola e ripianificata a cadenza fissa (periodo_ms meno il tempo speso
+    nel tick; after_idle se in ritardo).
+    """
+    def _tick():
+        t0 = time.monotonic()
+        try:
+            _show_frame_impl(cache, lmain)
+        except Exception:
+            logging.error("Errore show_frame", exc_info=True)
+        finally:
+            delay = int(periodo_ms - (time.monotonic() - t0) * 1000)
+            if delay >= 1:
+                lmain.after(delay, _tick)
+            else:
+                lmain.after_idle(_tick)
+
+    _tick()
 
 
 def _show_frame_impl(cache, lmain):
     """
-    Elabora e visualizza un frame dell'immagine del faro.
+    Visualizza l'ultimo frame elaborato (stadio C della pipeline, thread Tk).
 
-    Ciclo principale di elaborazione che:
+    Il lavoro pesante è svolto da thread_acquisizione (stadio A) e
+    thread_elaborazione (stadio B); qui restano solo le operazioni Tk:
     1. Gestisce la visibilità della finestra
-    2. Carica e preprocessa l'immagine
-    3. Rileva il pattern del faro
-    4. Calcola luminosità e posizione
-    5. Visualizza croce di riferimento
-    6. Aggiorna i dati in coda per la comunicazione
+    2. Preleva il frame elaborato dalla coda display
+    3. Sposta la finestra se cambia rot
+    4. Converte e visualizza l'immagine
 
     Args:
         cache: Dizionario con configurazione e stato dell'applicazione
         lmain: Widget Label di tkinter per visualizzare l'immagine
     """
-    # ====================
-    # 0. HOT RELOAD CONFIG
-    # ====================
-    config_file = os.path.join(cache['percorso_script'], 'config.json')
-    try:
-        mtime = os.path.getmtime(config_file)
-        if mtime != cache.get('config_mtime', 0):
-            cache['config_mtime'] = mtime
-            init_config('config.json', cache, cache['percorso_script'])
-            logging.info("Config ricaricata (file modificato)")
-    except Exception as e:
-        logging.error(f"Errore hot reload config: {e}")
-
     # ====================
     # 1. GESTIONE VISIBILITÀ FINESTRA
     # ====================
@@ -131,23 +265,161 @@ def _show_frame_impl(cache, lmain):
         root.withdraw()
         logging.info("Finestra nascosta")
 
-    # Timer debug
+    # ====================
+    # 2. FRAME ELABORATO
+    # ====================
+    try:
+        risultato = cache['coda_display'].get_nowait()
+    except Empty:
+        return
+
+    image_output = risultato['image_output']
+    rot = risultato['rot']
+    config = cache['config']
+
+    # Sposta finestra se rot cambia
+    if 'root' in cache and rot != cache.get('last_rot', 0):
+        root = cache['root']
+        width = config['width']
+        height = config['height']
+        if rot == 1:
+            # Posizione ruotata
+            new_x = cache['screen_width'] - config['window_shift_x'] - width
+            new_y = cache['screen_height'] - config['window_shift_y'] - height
+        else:
+            # Posizione normale
+            new_x = config['window_shift_x']
+            new_y = config['window_shift_y']
+        root.geometry(f"{width}x{height}+{new_x}+{new_y}")
+        cache['last_rot'] = rot
+        logging.info(f"Finestra spostata per rot={rot}: ({new_x}, {new_y})")
+
     if cache['DEBUG']:
-        t0 = time.monotonic()
+        t_disp = time.monotonic()
+
+    # Buffer RGB, PIL.Image e PhotoImage persistenti (ricreati solo se cambia la dimensione)
+    rgb_buf, pil_img = _buffer_display(cache, lmain, image_output.shape[:2])
+
+    # Converti BGR (OpenCV) → RGB (PIL/tkinter) direttamente nel buffer persistente.
+    # Se rot=1 la rotazione di 180° è fusa nella stessa copia (view con stride
+    # negativi su righe, colonne e canali), senza un secondo passaggio.
+    if rot == 1:
+        np.copyto(rgb_buf[:, :, :3], image_output[::-1, ::-1, ::-1])
+    else:
+        cv2.cvtColor(image_output, cv2.COLOR_BGR2RGBA, dst=rgb_buf)
+
+    lmain.imgtk.paste(pil_img)
+
+    if cache['DEBUG']:
+        tempi_display = cache.get('tempi_display')
+        if tempi_display is None:
+            tempi_display = cache['tempi_display'] = deque(maxlen=_N_TEMPI)
+        tempi_display.append(time.monotonic() - t_disp)
+
+
+def _buffer_display(cache, lmain, shape):
+    """
+    Ritorna (rgb_buf, pil_img) persistenti per la visualizzazione.
+
+    pil_img è creata con frombuffer e condivide la memoria di rgb_buf (RGBA:
+    PIL condivide il buffer solo per pixel a 4 byte, alpha sempre 255); il
+    PhotoImage associato a lmain viene creato una sola volta e aggiornato
+    con paste() ad ogni frame.
+
+    Args:
+        cache: Dizionario cache (usa 'display_buf')
+        lmain: Widget Label di tkinter
+        shape: (height, width) dell'immagine da visualizzare
+    """
+    display_buf = cache.get('display_buf')
+    if display_buf is not None and display_buf[0].shape[:2] == shape:
+        return display_buf
+
+    h, w = shape
+    rgb_buf = np.full((h, w, 4), 255, dtype=np.uint8)
+    pil_img = PIL.Image.frombuffer('RGBA', (w, h), rgb_buf, 'raw', 'RGBA', 0, 1)
+    lmain.imgtk = ImageTk.PhotoImage(image=pil_img)
+    lmain.configure(image=lmain.imgtk)
+
+    cache['display_buf'] = (rgb_buf, pil_img)
+    logging.info(f"Buffer display allocato {w}x{h}")
+    return cache['display_buf']
+
+
+def thread_acquisizione(cache):
+    """
+    Stadio A della pipeline: acquisizione e preprocessing dei frame.
+
+    Mette in cache['coda_frame'] i frame pronti per la detection; la put
+    bloccante su coda limitata rallenta l'acquisizione se l'elaborazione
+    non tiene il passo.
+
+    Args:
+        cache: Dizionario con configurazione e stato dell'applicazione
+    """
+    _imposta_affinita(cache, 'acquisizione')
+
+    while True:
+        try:
+            frame = _acquisisci_frame(cache)
+        except Exception:
+            logging.error("Errore thread_acquisizione", exc_info=True)
+            frame = None
+
+        if frame is None:
+            time.sleep(0.005)
+            continue
+
+        cache['coda_frame'].put(frame)
+
+
+def _acquisisci_frame(cache):
+    """
+    Carica e preprocessa un frame.
+
+    Args:
+        cache: Dizionario con configurazione e stato dell'applicazione
+
+    Returns:
+        Dict con 't0', 'stato', 'image_input', 'image_view', 'image_view_orig'
+        oppure None se non c'è un frame nuovo
+    """
+    # ====================
+    # 0. HOT RELOAD CONFIG (flag impostato da thread_config)
+    # ====================
+    if cache.pop('config_dirty', False):
+        try:
+            init_config('config.json', cache, cache['percorso_script'])
+            logging.info("Config ricaricata (file modificato)")
+        except Exception as e:
+            logging.error(f"Errore hot reload config: {e}")
+
+    # Timer debug
+    t0 = time.monotonic()
+
+    # Stato comunicazione congelato per tutto il frame
+    stato_comunicazione = dict(cache.get('stato_comunicazione', {}))
 
     # ====================
     # 2. CARICAMENTO FRAME
     # ====================
-    image_input = cv2.imread("/tmp/frame.jpg")
+    # Frame da memoria condivisa (fallback /tmp/frame.jpg), None se invariato
+    image_input = leggi_frame(cache)
 
     if image_input is None:
-        return
+        return None
+    t_letto = time.monotonic()
 
     # ====================
     # 3. PREPROCESSING IMMAGINE
     # ====================
     # Preprocessing base e auto-esposizione
     image_input, image_view = preprocess(image_input, cache)
+
+    # Scarta il frame se il produttore lo ha sovrascritto durante la copia
+    if not frame_valido(cache):
+        return None
+
     if cache['AUTOEXP']:
         image_view = autoexp(image_input, image_view, cache)
     else:
@@ -155,29 +427,123 @@ def _show_frame_impl(cache, lmain):
 
     # Posizione: 0=dx, 1=sx, 2=fendinebbia
     pos = str(stato_comunicazione.get('pos', '0'))
-    is_left_position = (pos == '1')
-    is_fendinebbia_mode = (pos == '2')
 
-    # Flip immagine se posizione sinistra
-    if is_left_position:
-        image_input = cv2.flip(image_input, 1)
-        image_view = cv2.flip(image_view, 1)
+    # Flip immagine se posizione sinistra: view con stride negativo (nessuna copia),
+    # materializzata dalla cvtColor/copy successive
+    if pos == '1':
+        image_input = image_input[:, ::-1]
+        image_view = image_view[:, ::-1]
 
     # Salva copia image_view prima di qualsiasi conversione pattern (per save)
-    image_view_orig = image_view.copy()
+    image_view_orig = buffer_rotante(cache, 'view_orig_buf', image_view.shape)
+    np.copyto(image_view_orig, image_view)
 
     # Conversione pattern (0,1 = grayscale, 2 = colormap JET)
     pattern = stato_comunicazione.get('pattern', '0')
-    logging.debug(f"[PT] {pattern}")
+    if logging.getLogger().isEnabledFor(logging.DEBUG):
+        logging.debug("[PT] %s", pattern)
+
+    cvtColor = cv2.cvtColor
+    if pattern in ('0', '1', '2'):
+        # Grayscale in un buffer preallocato (anello: più frame in volo nella pipeline)
+        gray = buffer_rotante(cache, 'gray_buf', image_input.shape[:2])
+        if pattern == '2' and NUMBA_DISPONIBILE:
+            # Gray + colormap JET in un unico kernel (un solo passaggio sui pixel)
+            view_jet = buffer_rotante(cache, 'jet_buf', image_view.shape)
+            fuse_gray_jet(image_input, image_view, gray, view_jet, JET_LUT)
+            image_input = gray
+            image_view = view_jet
+        else:
+            image_input = cvtColor(image_input, _BGR2GRAY, dst=gray)
+            if pattern == '1':
+                image_view = buffer_rotante(cache, 'jet_buf', image_view.shape)
+                image_view.fill(0)
+            elif pattern == '2':
+                image_view = cv2.applyColorMap(
+                    image_view, cv2.COLORMAP_JET,
+                    dst=buffer_rotante(cache, 'jet_buf', image_view.shape)
+                )
+
+    # draw_results disegna su image_view: OpenCV richiede un buffer contiguo
+    if not image_view.flags.c_contiguous:
+        contiguo = buffer_rotante(cache, 'view_contig_buf', image_view.shape)
+        np.copyto(contiguo, image_view)
+        image_view = contiguo
+
+    return {
+        't0': t0,
+        't_letto': t_letto,
+        't_pre': time.monotonic(),
+        'stato': stato_comunicazione,
+        'image_input': image_input,
+        'image_view': image_view,
+        'image_view_orig': image_view_orig,
+    }
+
+
+def thread_elaborazione(cache):
+    """
+    Stadio B della pipeline: detection, luminosità e overlay.
+
+    Unico thread che esegue i detector (stateful tramite cache), preleva da
+    cache['coda_frame'] e mette il risultato in cache['coda_display'] senza
+    mai bloccarsi sulla GUI (viene tenuto solo l'ultimo frame elaborato).
+
+    Args:
+        cache: Dizionario con configurazione e stato dell'applicazione
+    """
+    _imposta_affinita(cache, 'elaborazione')
+
+    while True:
+        frame = cache['coda_frame'].get()
+        try:
+            risultato = _elabora_frame(cache, frame)
+        except Exception:
+            logging.error("Errore thread_elaborazione", exc_info=True)
+            continue
+
+        # Latest-wins: se la GUI non ha ancora visualizzato il frame precedente, lo scarta
+        metti_ultimo(cache['coda_display'], risultato)
+
+
+def _elabora_frame(cache, frame):
+    """
+    Elabora un frame preprocessato.
+
+    1. Rileva il pattern del faro
+    2. Calcola luminosità e posizione
+    3. Visualizza croce di riferimento
+    4. Aggiorna i dati in coda per la comunicazione
+
+    Args:
+        cache: Dizionario con configurazione e stato dell'applicazione
+        frame: Dict prodotto da _acquisisci_frame
+
+    Returns:
+        Dict con 'image_output' (BGR) e 'rot'
+    """
+    t0 = frame['t0']
+    t_inizio = time.monotonic()
+    stato_comunicazione = frame['stato']
+    image_input = frame['image_input']
+    image_view = frame['image_view']
+    image_view_orig = frame['image_view_orig']
 
-    if pattern == '0':
-        image_input = cv2.cvtColor(image_input, cv2.COLOR_BGR2GRAY)
-    elif pattern == '1':
-        image_input = cv2.cvtColor(image_input, cv2.COLOR_BGR2GRAY)
-        image_view = image_view * 0
-    elif pattern == '2':
-        image_view = cv2.applyColorMap(image_view.copy(), cv2.COLORMAP_JET)
-        image_input = cv2.cvtColor(image_input, cv2.COLOR_BGR2GRAY)
+    config = cache['config']
+    width = config['width']
+    height = config['height']
+    sc_get = stato_comunicazione.get
+    dbg = logging.getLogger().isEnabledFor(logging.DEBUG)
+
+    # Parametri croce letti una volta per frame (croce a video e immagini salvate)
+    inclinazione = sc_get('incl', 0)
+    toh = sc_get('TOH', config.get('TOH', 50))
+    tov = sc_get('TOV', config.get('TOV', 50))
+    tov_fendinebbia = config.get('TOV', 50)
+
+    pos = str(sc_get('pos', '0'))
+    is_left_position = (pos == '1')
+    is_fendinebbia_mode = (pos == '2')
 
     # ====================
     # 4. ELABORAZIONE TIPO FARO / CALIBRAZIONE
@@ -186,37 +552,41 @@ def _show_frame_impl(cache, lmain):
     if is_fendinebbia_mode:
         tipo_faro = 'fendinebbia'
     else:
-        tipo_faro = stato_comunicazione.get('tipo_faro', 'anabbagliante').strip()
+        tipo_faro = sc_get('tipo_faro', 'anabbagliante').strip()
 
     # Modalità calibrazione - avvia solo su transizione a 'calibrazione'
     prev_tipo_faro = cache.get('prev_tipo_faro', '')
     cache['prev_tipo_faro'] = tipo_faro
 
+    # Step di calibrazione letto una sola volta per frame (sotto calib_lock:
+    # handle_click lo fa avanzare dal thread Tk)
+    calib_step = None
     if tipo_faro == 'calibrazione':
-        # Transizione da altro tipo_faro -> calibrazione: ricrea e avvia
-        if prev_tipo_faro != 'calibrazione':
-            cache['calibration_manager'] = CalibrationManager(cache['percorso_script'], cache)
-            cache['calibration_manager'].start_calibration()
-        # Crea CalibrationManager on-demand se non esiste
-        elif 'calibration_manager' not in cache:
-            cache['calibration_manager'] = CalibrationManager(cache['percorso_script'], cache)
-            cache['calibration_manager'].start_calibration()
-
-        calibration_manager = cache['calibration_manager']
-
-    if tipo_faro == 'calibrazione' and cache.get('calibration_manager') and cache['calibration_manager'].calibration_active:
-        calibration_manager = cache['calibration_manager']
-        logging.debug(f"[CALIB] step={calibration_manager.current_step} active={calibration_manager.calibration_active}")
+        with cache['calib_lock']:
+            # Transizione da altro tipo_faro -> calibrazione: ricrea e avvia
+            if prev_tipo_faro != 'calibrazione':
+                cache['calibration_manager'] = CalibrationManager(cache['percorso_script'], cache)
+                cache['calibration_manager'].start_calibration()
+            # Crea CalibrationManager on-demand se non esiste
+            elif 'calibration_manager' not in cache:
+                cache['calibration_manager'] = CalibrationManager(cache['percorso_script'], cache)
+                cache['calibration_manager'].start_calibration()
+
+            calibration_manager = cache['calibration_manager']
+            if calibration_manager.calibration_active:
+                calib_step = calibration_manager.current_step
+
+    if calib_step is not None:
+        if dbg:
+            logging.debug("[CALIB] step=%s active=%s", calib_step, True)
 
         # Step 1: forza px_lux_dark = 0
-        if calibration_manager.current_step == 1:
+        if calib_step == 1:
             cache['calib_px_lux_dark'] = 0.0
 
         # Step con detection attiva (faro acceso)
-        if calibration_manager.current_step in [21, 22, 31, 40, 41]:
-            results = fari_detection.detect_anabbagliante(
-                image_input, cache, 5, 40, 120, 1e-8, 1e-8, 1000
-            )
+        if calib_step in [21, 22, 31, 40, 41]:
+            results = fari_detection.DETECTORS['anabbagliante'](image_input, cache)
             image_output = image_view.copy()
             point = results['punto']
             angles = results['angoli']
@@ -229,25 +599,17 @@ def _show_frame_impl(cache, lmain):
             results = {'punto': None, 'angoli': (0, 0, 0), 'linee': [], 'contorni': []}
 
         # Applica overlay di calibrazione
-        image_output = calibration_manager.process_frame(image_output, cache)
+        with cache['calib_lock']:
+            image_output = calibration_manager.process_frame(image_output, cache)
 
     # Modalità detection normale
     else:
         # Esegui detection (solo calcolo, no disegno)
-        if tipo_faro == 'anabbagliante':
-            results = fari_detection.detect_anabbagliante(
-                image_input, cache, 5, 40, 120, 1e-8, 1e-8, 1000
-            )
-        elif tipo_faro == 'fendinebbia':
-            results = fari_detection.detect_fendinebbia(
-                image_input, cache, 5, 40, 120, 1e-8, 1e-8, 1000
-            )
-        elif tipo_faro == 'abbagliante':
-            results = fari_detection.detect_abbagliante(
-                image_input, cache
-            )
+        detect = _DETECTORS_GET(tipo_faro)
+        if detect is not None:
+            results = detect(image_input, cache)
         else:
-            logging.warning(f"Tipo faro sconosciuto: {tipo_faro}")
+            logging.warning("Tipo faro sconosciuto: %s", tipo_faro)
             results = {'punto': None, 'angoli': (0, 0, 0), 'linee': [], 'contorni': []}
 
         # Disegna i risultati
@@ -257,19 +619,20 @@ def _show_frame_impl(cache, lmain):
         point = results['punto']
         angles = results['angoli']
 
+    t_det = time.monotonic()
+
     # ====================
     # 5. CALCOLO LUMINOSITÀ
     # ====================
-    config = cache['config']
-    lux_size = (config['lux_w'], config['lux_h'])
+    config = cache['config']  # la calibrazione può aver ricaricato la config
+    lux_size, lux_sft = _parametri_lux(cache, config)
 
     # Abbagliante e fendinebbia: quadrato centrato sul punto (offset 0)
     if tipo_faro in ('abbagliante', 'fendinebbia'):
         sft_x = 0
         sft_y = 0
     else:
-        sft_x = config['lux_sft_x'] * config['crop_w'] / 160
-        sft_y = config['lux_sft_y'] * config['crop_h'] / 160
+        sft_x, sft_y = lux_sft
 
     if point:
         px_lux = calcola_px_lux(
@@ -277,21 +640,21 @@ def _show_frame_impl(cache, lmain):
             (sft_x, sft_y), lux_size, cache, tipo_faro
         )
     else:
-        center_point = (config['width'] / 2, config['height'] / 2)
+        center_point = (width / 2, height / 2)
         px_lux = calcola_px_lux(
             image_input, image_output, center_point,
             (sft_x, sft_y), lux_size, cache, tipo_faro
         )
 
     cache['px_lux'] = px_lux
+    t_lux = time.monotonic()
 
-    cm = cache.get('calibration_manager')
-    if cm and cm.calibration_active and point:
+    if calib_step is not None and point:
         # Step 31: abbagliante incl 0 → px_lux_bright_abb
-        if cm.current_step == 31:
+        if calib_step == 31:
             cache['calib_px_lux_bright_abb'] = px_lux
         # Step 41: anabbagliante incl -4% → px_lux_bright
-        elif cm.current_step == 41:
+        elif calib_step == 41:
             cache['calib_px_lux_bright'] = px_lux
 
     # ====================
@@ -300,37 +663,35 @@ def _show_frame_impl(cache, lmain):
     # Flip finale se posizione sinistra
     if is_left_position:
         if point:
-            point = (config['width'] - point[0], point[1])
+            point = (width - point[0], point[1])
         image_output = cv2.flip(image_output, 1)
 
     # Visualizza croce di riferimento
-    if stato_comunicazione.get('croce', '0') == '1':
-        center_x = int(config['width'] / 2)
-        center_y = int(config['height'] / 2)
-        inclinazione = int(stato_comunicazione.get('incl', 0))
+    if sc_get('croce', '0') == '1':
+        geom = _geometria_croce(cache)
+
+        # overlay_planare: disegna su piani B/G/R separati (1 byte per pixel
+        # per scrittura) e reinterlaccia una volta alla fine
+        planare = config.get('overlay_planare', False)
+        if planare:
+            piani = [buffer_rotante(cache, f'piano_overlay_{c}', image_output.shape[:2], n=1)
+                     for c in range(3)]
+            cv2.split(image_output, piani)
+            target = piani
+            segmenti = disegna_segmenti_planare
+        else:
+            target = image_output
+            segmenti = disegna_segmenti
 
         if tipo_faro == 'fendinebbia':
-            # Linee orizzontali per fendinebbia
-            tov = config.get('TOV', 50)
-            y_top = center_y + inclinazione - tov
-            y_bottom = center_y + inclinazione + tov
-
-            disegna_segmento(
-                image_output, (0, y_top),
-                (config['width'], y_top), 1, 'green'
-            )
-            disegna_segmento(
-                image_output, (0, y_bottom),
-                (config['width'], y_bottom), 1, 'green'
-            )
+            # Linee orizzontali per fendinebbia (una sola polylines)
+            segmenti(target, geom['fendinebbia'], 1, 'green')
         else:
             # Croce standard per anabbagliante/abbagliante
-            toh = int(stato_comunicazione.get('TOH', config.get('TOH', 50)))
-            tov = int(stato_comunicazione.get('TOV', config.get('TOV', 50)))
-            visualizza_croce_riferimento(
-                image_output, center_x, center_y + inclinazione,
-                2 * tov, 2 * toh
-            )
+            segmenti(target, geom['croce'], 1, 'green')
+
+        if planare:
+            cv2.merge(piani, image_output)
 
     # ====================
     # 7. AGGIORNAMENTO DATI IN CODA
@@ -340,99 +701,65 @@ def _show_frame_impl(cache, lmain):
         ptok_result = is_punto_ok(point, cache)
 
         # Debug: verifica inclinazione e indicatori
-        incl_value = cache['stato_comunicazione'].get('inclinazione', 'NOT_SET')
-        toh_value = cache['stato_comunicazione'].get('TOH', 'NOT_SET')
-        tov_value = cache['stato_comunicazione'].get('TOV', 'NOT_SET')
-        logging.debug(f"Inclinazione: '{incl_value}' | TOH: '{toh_value}' | TOV: '{tov_value}'")
-        logging.debug(f"Punto: {point} | Indicatori: L={ptok_result['left']} R={ptok_result['right']} U={ptok_result['up']} D={ptok_result['down']}")
-
-        data = {
-            'posiz_pattern_x': point[0],
-            'posiz_pattern_y': point[1],
-            'px_lux': px_lux,
-            'yaw': angles[0],
-            'pitch': angles[1],
-            'roll': angles[2],
-            'left': ptok_result['left'],
-            'right': ptok_result['right'],
-            'up': ptok_result['up'],
-            'down': ptok_result['down']
-        }
+        if dbg:
+            logging.debug("Inclinazione: '%s' | TOH: '%s' | TOV: '%s'",
+                          sc_get('inclinazione', 'NOT_SET'), sc_get('TOH', 'NOT_SET'),
+                          sc_get('TOV', 'NOT_SET'))
+            logging.debug("Punto: %s | Indicatori: L=%s R=%s U=%s D=%s", point,
+                          ptok_result['left'], ptok_result['right'],
+                          ptok_result['up'], ptok_result['down'])
+
+        # Riga nell'ordine di comms.TX_CAMPI
+        dato = (point[0], point[1], px_lux, angles[0], angles[1], angles[2],
+                ptok_result['left'], ptok_result['right'], ptok_result['up'], ptok_result['down'])
     else:
-        data = {
-            'posiz_pattern_x': 0,
-            'posiz_pattern_y': 0,
-            'px_lux': px_lux,
-            'yaw': 0,
-            'pitch': 0,
-            'roll': 0,
-            'left': 0,
-            'right': 0,
-            'up': 0,
-            'down': 0
-        }
+        dato = (0, 0, px_lux, 0, 0, 0, 0, 0, 0, 0)
 
-    cache['queue'].put(data)
+    # Sovrascrive lo slot: comms invia solo la misura più recente
+    pubblica_dato(cache, dato)
 
     # ====================
     # 8. DEBUG E VISUALIZZAZIONE
     # ====================
     if cache['DEBUG']:
         elapsed_ms = int(1000 * (time.monotonic() - t0))
-        fps = int(1 / (t0 - cache.get('t0', 0))) if cache.get('t0') else 0
+        fps = int(1 / max(t0 - cache['t0'], 1e-6)) if 't0' in cache else 0
         msg = f"Elaborazione: {elapsed_ms} ms, FPS: {fps}"
         logging.debug(msg)
 
-        cv2.putText(
-            image_output, msg, (5, 60),
-            cv2.FONT_HERSHEY_COMPLEX_SMALL, 0.5,
-            get_colore('green'), 1
-        )
+        cv2.putText(image_output, msg, (5, 60), _FONT_DEBUG, 0.5, _COL_GREEN, 1)
         cache['t0'] = t0
 
+        _registra_tempi(cache, (
+            frame['t_letto'] - t0, frame['t_pre'] - frame['t_letto'],
+            t_inizio - frame['t_pre'], t_det - t_inizio, t_lux - t_det
+        ))
+
         # Autoexp debug
         autoexp_msg = cache.get('autoexp_debug_msg')
         if autoexp_msg:
-            cv2.putText(image_output, autoexp_msg, (5, 80),
-                    cv2.FONT_HERSHEY_COMPLEX_SMALL, 0.5, get_colore('green'), 1)
+            cv2.putText(image_output, autoexp_msg, (5, 80), _FONT_DEBUG, 0.5, _COL_GREEN, 1)
 
     # Indicatore autoexp: cerchio verde=ok, rosso lampeggiante=non ok
     h_out, w_out = image_output.shape[:2]
     indicator_pos = (w_out - 15, 15)
     if cache.get('autoexp_ok', False):
-        cv2.circle(image_output, indicator_pos, 8, get_colore('green'), -1)
+        cv2.circle(image_output, indicator_pos, 8, _COL_GREEN, -1)
     else:
         cache['blink_count'] = cache.get('blink_count', 0) + 1
         if cache['blink_count'] % 2 == 0:
-            cv2.circle(image_output, indicator_pos, 8, get_colore('red'), -1)
+            cv2.circle(image_output, indicator_pos, 8, _COL_RED, -1)
 
-    # Gestione rot (0=normale, 1=ruotato 180°)
-    rot = int(stato_comunicazione.get('rot', 0))
-
-    # Sposta finestra se rot cambia
-    if 'root' in cache and rot != cache.get('last_rot', 0):
-        root = cache['root']
-        width = config['width']
-        height = config['height']
-        if rot == 1:
-            # Posizione ruotata
-            new_x = cache['screen_width'] - config['window_shift_x'] - width
-            new_y = cache['screen_height'] - config['window_shift_y'] - height
-        else:
-            # Posizione normale
-            new_x = config['window_shift_x']
-            new_y = config['window_shift_y']
-        root.geometry(f"{width}x{height}+{new_x}+{new_y}")
-        cache['last_rot'] = rot
-        logging.info(f"Finestra spostata per rot={rot}: ({new_x}, {new_y})")
+    # Gestione rot (0=normale, 1=ruotato 180°); valori numerici già convertiti da comms
+    rot = sc_get('rot', 0)
 
     # ====================
     # SALVATAGGIO IMMAGINI (save=1 da comm)
     # ====================
-    save_val = stato_comunicazione.get('save', '0')
+    save_val = sc_get('save', '0')
     save_transizione = (save_val == '1') and (cache.get('prev_save') != '1')
     cache['prev_save'] = save_val
-    idx = stato_comunicazione.get('index', '0')
+    idx = sc_get('index', '0')
     save_dir = '/home/pi/img_report'
     # Cancella file del nuovo indice quando l'indice cambia
     if idx != cache.get('prev_index'):
@@ -442,22 +769,19 @@ def _show_frame_impl(cache, lmain):
                     os.remove(os.path.join(save_dir, f))
         cache['prev_index'] = idx
     if save_transizione:
-        lato = stato_comunicazione.get('lato', 'dx')
+        lato = sc_get('lato', 'dx')
         prefix = f"{idx}_{tipo_faro}_{lato}"
         os.makedirs(save_dir, exist_ok=True)
         gray_base = cv2.cvtColor(image_view_orig, cv2.COLOR_BGR2GRAY)
 
         def _applica_croce_save(img):
-            cx = int(config['width'] / 2)
-            cy = int(config['height'] / 2)
-            incl = int(stato_comunicazione.get('incl', 0))
+            cx = int(width / 2)
+            cy = int(height / 2)
+            incl = inclinazione
             if tipo_faro == 'fendinebbia':
-                tov = config.get('TOV', 50)
-                disegna_segmento(img, (0, cy + incl - tov), (config['width'], cy + incl - tov), 1, 'green')
-                disegna_segmento(img, (0, cy + incl + tov), (config['width'], cy + incl + tov), 1, 'green')
+                disegna_segmento(img, (0, cy + incl - tov_fendinebbia), (width, cy + incl - tov_fendinebbia), 1, 'green')
+                disegna_segmento(img, (0, cy + incl + tov_fendinebbia), (width, cy + incl + tov_fendinebbia), 1, 'green')
             else:
-                toh = int(stato_comunicazione.get('TOH', config.get('TOH', 50)))
-                tov = int(stato_comunicazione.get('TOV', config.get('TOV', 50)))
                 visualizza_croce_riferimento(img, cx, cy + incl, 2 * tov, 2 * toh)
             return img
 
@@ -475,19 +799,7 @@ def _show_frame_impl(cache, lmain):
 
         logging.info(f"Salvate immagini: {save_dir}/{prefix}_gray/graph/heat.jpg")
 
-    # Converti BGR (OpenCV) → RGB (PIL/tkinter) e visualizza immagine finale
-    image_rgb = cv2.cvtColor(image_output, cv2.COLOR_BGR2RGB)
-    img = PIL.Image.fromarray(image_rgb)
-
-    # Flip 180° solo per visualizzazione se rot=1
-    if rot == 1:
-        img = img.transpose(PIL.Image.ROTATE_180)
-
-    imgtk = ImageTk.PhotoImage(image=img)
-    lmain.imgtk = imgtk
-    lmain.configure(image=imgtk)
-
-    pass  # reschedule gestito dal wrapper show_frame
+    return {'image_output': image_output, 'rot': rot}
 
 
 def cleanup(p):
@@ -504,7 +816,8 @@ def cleanup(p):
         pass
 
 
-if __name__ == "__main__":
+def main():
+    """Avvio: logging, configurazione, thread della pipeline e mainloop Tk."""
     # Configurazione logging
     logging.basicConfig(
         level=logging.DEBUG,
@@ -545,17 +858,26 @@ if __name__ == "__main__":
         "AUTOEXP": False,
         "config": {},
         "stato_comunicazione": {},
-        "queue": Queue(),
+        "coda_frame": Queue(maxsize=2),     # acquisizione -> elaborazione
+        "coda_display": Queue(maxsize=1),   # elaborazione -> GUI (solo ultimo frame)
+        "calib_lock": threading.RLock(),    # CalibrationManager: thread Tk (click) / elaborazione
         "percorso_script": percorso_script,
         "init_config": None  # Sarà impostato dopo
     }
 
+    # Ultimo dato elaborazione -> comms (cache['tx_dato'])
+    init_tx_dato(cache)
+
     # Passa riferimento a init_config in cache (per calibrazione)
     cache["init_config"] = lambda config_path: init_config(config_path, cache, percorso_script)
 
     # Carica configurazione iniziale
     init_config("config.json", cache, percorso_script)
 
+    # Il parallelismo è dato dalla pipeline a thread: evita che il pool interno
+    # di OpenCV competa con i thread Python per gli stessi core
+    cv2.setNumThreads(int(cache['config'].get('cv_num_threads', 1)))
+
     #Avvia thread di comunicazione 
     if cache['COMM']:
         threading.Thread(
@@ -565,40 +887,58 @@ if __name__ == "__main__":
         ).start()
 
     # Inizializza e avvia GUI
-    if True:
-        if cache['CAMERA']:
-            indice_camera = 0
-            cache['config']['indice_camera'] = indice_camera
-            set_camera(indice_camera, cache['config'])
-            time.sleep(1)
-
-        # Callback per il click del mouse (modalità calibrazione e pulsante touch)
-        def callback_click(event):
-            """Gestisce il click del mouse/touch durante la calibrazione."""
+    if cache['CAMERA']:
+        indice_camera = 0
+        cache['config']['indice_camera'] = indice_camera
+        set_camera(indice_camera, cache['config'])
+        time.sleep(1)
+
+    # Callback per il click del mouse (modalità calibrazione e pulsante touch)
+    def callback_click(event):
+        """Gestisce il click del mouse/touch durante la calibrazione."""
+        with cache['calib_lock']:
             calibration_manager = cache.get('calibration_manager')
-            if calibration_manager and calibration_manager.calibration_active:
-                logging.info(f"Click ricevuto in calibrazione: ({event.x}, {event.y})")
+            attiva = calibration_manager and calibration_manager.calibration_active
+            if attiva:
+                logging.info("Click ricevuto in calibrazione: (%s, %s)", event.x, event.y)
                 calibration_manager.handle_click(event.x, event.y, cache)
-            else:
-                logging.debug(f"Click ignorato (non in modalità calibrazione): ({event.x}, {event.y})")
+        if not attiva:
+            logging.debug("Click ignorato (non in modalità calibrazione): (%s, %s)", event.x, event.y)
+
+    root = tk.Tk()
+    root.overrideredirect(True)
+    root.geometry(
+        f"{cache['config']['width']}x{cache['config']['height']}+"
+        f"{cache['config']['window_shift_x']}+{cache['config']['window_shift_y']}"
+    )
+    root.resizable(False, False)
 
-        root = tk.Tk()
-        root.overrideredirect(True)
-        root.geometry(
-            f"{cache['config']['width']}x{cache['config']['height']}+"
-            f"{cache['config']['window_shift_x']}+{cache['config']['window_shift_y']}"
-        )
-        root.resizable(False, False)
+    # Salva dimensioni schermo e root in cache per gestione rot
+    cache['screen_width'] = root.winfo_screenwidth()
+    cache['screen_height'] = root.winfo_screenheight()
+    cache['root'] = root
+    cache['last_rot'] = 0  # Traccia ultimo valore rot per rilevare cambiamenti
+
+    lmain = tk.Label(root)
+    lmain.bind("<Button-1>", callback_click)  # Bind click sinistro/touch
+    lmain.pack()
+
+    # Hot reload config.json
+    threading.Thread(
+        target=thread_config, args=(cache,), daemon=True, name="config"
+    ).start()
 
-        # Salva dimensioni schermo e root in cache per gestione rot
-        cache['screen_width'] = root.winfo_screenwidth()
-        cache['screen_height'] = root.winfo_screenheight()
-        cache['root'] = root
-        cache['last_rot'] = 0  # Traccia ultimo valore rot per rilevare cambiamenti
+    # Pipeline: acquisizione -> elaborazione -> GUI (show_frame)
+    threading.Thread(
+        target=thread_acquisizione, args=(cache,), daemon=True, name="acquisizione"
+    ).start()
+    threading.Thread(
+        target=thread_elaborazione, args=(cache,), daemon=True, name="elaborazione"
+    ).start()
 
-        lmain = tk.Label(root)
-        lmain.bind("<Button-1>", callback_click)  # Bind click sinistro/touch
-        lmain.pack()
+    show_frame(cache, lmain)
+    root.mainloop()
 
-        show_frame(cache, lmain)
-        root.mainloop()
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,6 @@ from PIL import ImageTk
 import time
 import threading
 from functools import partial
-import json
 import os
 import subprocess
 import atexit
@@ -16,15 +15,19 @@ from datetime import datetime
 import logging
 import cv2
 
-from utils import uccidi_processo
+from utils import uccidi_processo, carica_json, salva_json
 from camera import set_camera, apri_camera,autoexp,fixexp
+from frame_shm import leggi_frame
 
 
 def show_frame( cache, lmain):
-    image_input = cv2.imread("/tmp/frame.jpg")
+    # Frame da memoria condivisa (fallback /tmp/frame.jpg), None se invariato
+    image_input = leggi_frame(cache)
     if image_input is None:
         lmain.after(10, lambda: show_frame(cache, lmain))
         return
+    # Copia locale: si disegna sul frame e lo slot condiviso verrà riscritto
+    image_input = image_input.copy()
    # image_input = image_input[-cache['config']['height']:, :]
     fixexp(cache,5000)
     #cache['autoexp_ok']=False
@@ -44,7 +47,6 @@ def show_frame( cache, lmain):
 
         # Segnala che la procedura e' terminata
         cache["OK"] = True
-    logging.info("xxxx"+str(cache["crop_w"]))
     if not cache["crop_center"]:
         cv2.putText(image_input, "Clicca sul punto che dovra' essere", (5, 30), cv2.FONT_HERSHEY_COMPLEX, 1, (255, 0, 0), 1)
         cv2.putText(image_input, "al centro del frame", (5, 60), cv2.FONT_HERSHEY_COMPLEX, 1, (255, 0, 0), 1)
@@ -56,9 +58,13 @@ def show_frame( cache, lmain):
          cv2.putText(image_input, "la procedura", (5, 60), cv2.FONT_HERSHEY_COMPLEX, 1, (255, 0, 0), 1)
 
     img = PIL.Image.fromarray(image_input)
-    imgtk = ImageTk.PhotoImage(image=img)
-    lmain.imgtk = imgtk
-    lmain.configure(image=imgtk)
+    # PhotoImage creato una volta e aggiornato con paste (niente nuova immagine Tk per frame)
+    if getattr(lmain, 'imgtk', None) is None or lmain.imgtk.width() != img.width \
+            or lmain.imgtk.height() != img.height:
+        lmain.imgtk = ImageTk.PhotoImage(image=img)
+        lmain.configure(image=lmain.imgtk)
+    else:
+        lmain.imgtk.paste(img)
     lmain.after(5, lambda: show_frame(cache, lmain))
 
 
@@ -97,8 +103,17 @@ if __name__ == "__main__":
 
     # Carica la configurazione
     percorso_script = os.path.dirname(os.path.abspath(__file__))
-    with open(os.path.join(percorso_script, f"config_{tipo_faro}.json"), "r") as f:
-        config = json.load(f)
+    config = carica_json(os.path.join(percorso_script, f"config_{tipo_faro}.json"))
+
+    # Contenuto su file delle config tenuto in memoria: il click aggiorna
+    # crop_center e le riscrive (atomicamente) senza rileggerle
+    percorso_config_faro = os.path.join(percorso_script, f"config_{tipo_faro}.json")
+    percorso_config_fendinebbia = os.path.join(percorso_script, "config_fendinebbia.json")
+    config_faro = dict(config)
+    if tipo_faro == "fendinebbia":
+        config_fendinebbia = config_faro
+    else:
+        config_fendinebbia = carica_json(percorso_config_fendinebbia)
 
     try:
         del config["crop_center"]
@@ -153,12 +168,9 @@ if __name__ == "__main__":
     def callback_click(event):
         logging.info(f"callback_click {event.x}, {event.y}")
 
-        with open(os.path.join(percorso_script, f"config_{tipo_faro}.json"), "r") as f:
-            config = json.load(f)
-
         if not cache["crop_center"]:
-            config["crop_center"] = (event.x, event.y)
-            cache["crop_center"] = config["crop_center"]
+            config_faro["crop_center"] = (event.x, event.y)
+            cache["crop_center"] = config_faro["crop_center"]
         # elif not cache["crop_w"] or not cache["crop_h"]:
         #     config["crop_w"] = 2 * abs(event.x - cache["crop_center"][0])
         #     config["crop_h"] = 2 * abs(event.y - cache["crop_center"][1])
@@ -168,13 +180,9 @@ if __name__ == "__main__":
         if cache["OK"]:
             sys.exit(0)
 
-        with open(os.path.join(percorso_script, f"config_{tipo_faro}.json"), "w") as f:
-            json.dump(config, f, indent=4)
-        with open(os.path.join(percorso_script, f"config_fendinebbia.json"), "r") as f:
-            config = json.load(f)
-        config["crop_center"] = (event.x, event.y)
-        with open(os.path.join(percorso_script, f"config_fendinebbia.json"), "w") as f:
-            json.dump(config, f, indent=4)#agg
+        salva_json(percorso_config_faro, config_faro)
+        config_fendinebbia["crop_center"] = (event.x, event.y)
+        salva_json(percorso_config_fendinebbia, config_fendinebbia)
 
     root = tk.Tk()
     root.overrideredirect(True)
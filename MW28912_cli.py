@@ -1,9 +1,9 @@
 import sys
 import cv2
-import json
 
 from funcs_misc import preprocess
 from funcs_anabbagliante import rileva_punto_angoloso
+from utils import carica_json
 
 
 if __name__ == "__main__":
@@ -11,8 +11,7 @@ if __name__ == "__main__":
     path_image = sys.argv[2]
 
     # Carica la configurazione
-    with open(f"config_{tipo_faro}.json", "r") as f:
-        config = json.load(f)
+    config = carica_json(f"config_{tipo_faro}.json")
 
     cache = {
         "DEBUG": True,
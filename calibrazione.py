@@ -15,10 +15,10 @@ Step di calibrazione:
 """
 
 import cv2
-import json
 import os
 import logging
-from utils import get_colore
+import numpy as np
+from utils import get_colore, crea_sprite, componi_sprite, salva_json
 import fari_detection
 
 
@@ -48,14 +48,82 @@ STRINGS_IT = {
 
 STRINGS = STRINGS_IT
 
+# Istruzione per substep, risolta una volta (chiave intera, niente f-string per frame)
+_INSTRUCTION_FOR_STEP = {
+    s: STRINGS.get(f'step{s}_instruction', '')
+    for s in (1, 20, 21, 22, 30, 31, 40, 41, 100)
+}
+
+# Gruppi elencati nell'overlay (numero gruppo, nome), costruiti una volta
+_GROUP_NAMES = tuple(
+    (g, STRINGS[f'step{g}_name']) for g in (1, 2, 3, 4, 100)
+)
+
+# Colori UI risolti una volta all'import
+_COL_CYAN = get_colore('cyan')
+_COL_YELLOW = get_colore('yellow')
+_COL_GREEN = get_colore('green')
+_COL_WHITE = get_colore('white')
+
+# Spessori delle icone della colonna gruppi: spunta (completato) e
+# cerchio vuoto (da fare)
+_ICON_THICKNESS = 2
+_PENDING_THICKNESS = 1
+
+# Font e stili testo dell'overlay
+_FONT = cv2.FONT_HERSHEY_SIMPLEX
+_TITLE_SCALE, _TITLE_THICKNESS = 0.7, 2
+_TEXT_SCALE, _TEXT_THICKNESS = 0.5, 1
+
+
+def _apply_ops(image, ops):
+    """
+    Esegue su image una lista di operazioni di disegno:
+        ('text', testo, org, scala, colore, spessore)
+        ('line', p1, p2, colore, spessore)
+        ('circle', centro, raggio, colore, spessore)
+    Tutto con lineType=cv2.LINE_8 esplicito (niente antialiasing sull'overlay).
+    Ritorna image.
+    """
+    putText = cv2.putText
+    line = cv2.line
+    circle = cv2.circle
+    FONT = _FONT
+    LINE_8 = cv2.LINE_8
+
+    for op in ops:
+        tipo = op[0]
+        if tipo == 'text':
+            _, testo, org, scala, colore, spessore = op
+            putText(image, testo, org, FONT, scala, colore, spessore, LINE_8)
+        elif tipo == 'line':
+            line(image, *op[1:], LINE_8)
+        elif tipo == 'circle':
+            circle(image, *op[1:], LINE_8)
+    return image
+
 
 class CalibrationManager:
     """
     Gestisce il processo di calibrazione multi-step.
     """
 
+    __slots__ = (
+        'config_path', 'default_file', 'config_file', 'cache',
+        'current_step', 'step_data', 'calibration_active', '_completed_mask',
+        '_config_dirty', '_calib_log', '_width', '_height',
+        '_ui_dirty', '_ui_shape', '_ui_sprites', '_last_draw_ops',
+        '_click_handlers', '_frame_handlers',
+    )
+
     STEP_SEQUENCE = [1, 20, 21, 22, 30, 31, 40, 41]
 
+    # Substep successivo (l'ultimo porta a 100, schermata finale)
+    STEP_NEXT = dict(zip(STEP_SEQUENCE, STEP_SEQUENCE[1:] + [100]))
+
+    # Bit di ogni substep nella maschera degli step completati
+    STEP_BIT = {s: 1 << i for i, s in enumerate(STEP_SEQUENCE + [100])}
+
     # Mappa substep -> numero gruppo UI
     STEP_GROUP = {
         1: 1,
@@ -77,12 +145,44 @@ class CalibrationManager:
         self.current_step = 0
         self.step_data = {}
         self.calibration_active = False
-        self.steps_completed = set()
-        self.exit_button_rect = None
+        self._completed_mask = 0
+        # Modifiche alla config in memoria non ancora scritte su config.json
+        self._config_dirty = False
+        # Overlay UI pre-renderizzato, ricreato solo quando _ui_dirty (cambio di stato)
+        self._ui_dirty = True
+        self._ui_shape = None
+        self._ui_sprites = ()
+        self._last_draw_ops = None
+        self._refresh_geometry(cache)
         self._calib_log = logging.getLogger('calibrazione')
 
-    def _log(self, msg):
-        self._calib_log.info(f"[CALIB_LOG] {msg}")
+        # Dispatch per substep: click utente e step che attendono autoexp
+        self._click_handlers = {
+            1: self._handle_click_step1,
+            20: self._handle_click_step20,
+            22: self._handle_click_step22,
+            30: self._handle_click_step30,
+            40: self._handle_click_step40,
+        }
+        self._frame_handlers = {
+            21: self._process_step21,
+            31: self._process_step31,
+            41: self._process_step41,
+        }
+
+    def _refresh_geometry(self, cache):
+        """
+        Legge una volta width/height dalla config (da richiamare dopo ogni
+        init_config) e invalida gli overlay che ne dipendono.
+        """
+        cfg = cache['config']
+        self._width = cfg.get('width', 630)
+        self._height = cfg.get('height', 320)
+        self._ui_dirty = True
+        self._last_draw_ops = None
+
+    def _log(self, msg, *args):
+        self._calib_log.info("[CALIB_LOG] " + msg, *args)
 
     def start_calibration(self):
         logging.info("Avvio calibrazione: caricamento default.json in cache")
@@ -92,50 +192,66 @@ class CalibrationManager:
             init_config("default.json")
         else:
             logging.warning("init_config non disponibile in cache")
+        self._refresh_geometry(self.cache)
 
-        self.steps_completed = set()
+        self._completed_mask = 0
         self.calibration_active = True
         self.current_step = 1
         self.step_data = {'state': 0}
 
-        logging.info(f"Calibrazione avviata: step {self.current_step}")
+        logging.info("Calibrazione avviata: step %s", self.current_step)
         self._log("=== INIZIO CALIBRAZIONE ===")
 
     def stop_calibration(self):
         logging.info("Calibrazione terminata")
         self._log("=== FINE CALIBRAZIONE ===")
 
-        try:
-            with open(self.config_file, 'w') as f:
-                json.dump(self.cache['config'], f, indent=4)
-            logging.info("Configurazione salvata in config.json")
-        except Exception as e:
-            logging.error(f"Errore nel salvare config.json: {e}")
-
+        # Si torna sempre a config.json: dopo il completamento è la calibrazione
+        # appena salvata, se interrotta le modifiche parziali vengono scartate
+        # (su disco restano solo crop_center dello step 22 e quanto salvato
+        # da _complete_calibration)
+        self._config_dirty = False
         init_config = self.cache.get('init_config')
         if init_config:
             init_config("config.json")
+        self._refresh_geometry(self.cache)
 
         self.calibration_active = False
         self.current_step = 0
         self.step_data = {}
-        self.steps_completed = set()
+        self._completed_mask = 0
+        self._ui_dirty = True
+
+    def _salva_config(self):
+        """
+        Scrive cache['config'] su config.json, solo se modificata dall'ultimo
+        salvataggio. Ritorna True se il file è stato scritto.
+        """
+        if not self._config_dirty:
+            return False
+        try:
+            salva_json(self.config_file, self.cache['config'])
+            # mtime della propria scrittura: thread_config non la rileva come
+            # modifica esterna e non fa rileggere il file appena scritto
+            self.cache['config_mtime'] = os.path.getmtime(self.config_file)
+            self._config_dirty = False
+            logging.info("Configurazione salvata in config.json")
+            return True
+        except Exception as e:
+            logging.error("Errore nel salvare config.json: %s", e)
+            return False
 
     def _advance_to_next_step(self):
-        self.steps_completed.add(self.current_step)
-        logging.info(f"Step {self.current_step} completato")
-
-        try:
-            idx = self.STEP_SEQUENCE.index(self.current_step)
-            if idx + 1 < len(self.STEP_SEQUENCE):
-                self.current_step = self.STEP_SEQUENCE[idx + 1]
-                self.step_data = {'state': 0}
-                logging.info(f"Avanzamento a step {self.current_step}")
-            else:
-                self.current_step = 100
-                logging.info("Tutti gli step completati, mostro schermata finale")
-        except ValueError:
-            self.current_step = 100
+        self._completed_mask |= self.STEP_BIT.get(self.current_step, 0)
+        self._ui_dirty = True
+        logging.info("Step %s completato", self.current_step)
+
+        self.current_step = self.STEP_NEXT.get(self.current_step, 100)
+        if self.current_step != 100:
+            self.step_data = {'state': 0}
+            logging.info("Avanzamento a step %s", self.current_step)
+        else:
+            logging.info("Tutti gli step completati, mostro schermata finale")
 
     def process_frame(self, image_output, cache):
         if not self.calibration_active:
@@ -143,103 +259,86 @@ class CalibrationManager:
 
         self._draw_calibration_ui(image_output, cache)
 
-        if self.current_step == 21:
-            self._process_step21(image_output, cache)
-        elif self.current_step == 31:
-            self._process_step31(image_output, cache)
-        elif self.current_step == 41:
-            self._process_step41(image_output, cache)
+        fn = self._frame_handlers.get(self.current_step)
+        if fn:
+            fn(image_output, cache)
 
         return image_output
 
     def _draw_calibration_ui(self, image_output, cache):
-        height = cache['config'].get('height', 320)
-
-        color_title = get_colore('cyan')
-        color_active = get_colore('yellow')
-        color_completed = get_colore('green')
-        color_pending = get_colore('white')
-        color_instruction = get_colore('cyan')
-
-        cv2.putText(image_output, STRINGS['title'], (10, 25),
-                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, color_title, 2)
-
-        group_names = [
-            (1,   STRINGS['step1_name']),
-            (2,   STRINGS['step2_name']),
-            (3,   STRINGS['step3_name']),
-            (4,   STRINGS['step4_name']),
-            (100, STRINGS['step100_name']),
-        ]
+        # Overlay ricostruito solo se lo stato è cambiato (_ui_dirty, impostato
+        # ad ogni cambio di step/geometria) o cambia la dimensione del frame
+        shape = image_output.shape
+        if self._ui_dirty or shape != self._ui_shape:
+            ops = self._calibration_ui_ops(cache)
+            # Stato diverso ma stesso disegno: gli sprite restano validi
+            if ops != self._last_draw_ops or shape != self._ui_shape:
+                self._ui_sprites = tuple(
+                    crea_sprite(_apply_ops(np.zeros(shape, dtype=np.uint8), o))
+                    for o in ops
+                )
+                self._last_draw_ops = ops
+                self._ui_shape = shape
+            self._ui_dirty = False
+        for sprite in self._ui_sprites:
+            componi_sprite(image_output, sprite)
+
+    def _calibration_ui_ops(self, cache):
+        """
+        Descrive l'overlay di calibrazione come liste di operazioni di disegno
+        (vedi _apply_ops): elenco gruppi in alto e istruzione in basso, ognuna
+        rasterizzata in uno sprite separato.
+        """
+        height = self._height
+
+        ops_gruppi = [('text', STRINGS['title'], (10, 25),
+                       _TITLE_SCALE, _COL_CYAN, _TITLE_THICKNESS)]
 
         current_group = self.STEP_GROUP.get(self.current_step, 0)
 
         y_pos = 55
-        for group_num, group_name in group_names:
+        for group_num, group_name in _GROUP_NAMES:
             last_substep = self.GROUP_LAST[group_num]
-            is_completed = last_substep in self.steps_completed
+            is_completed = bool(self._completed_mask & self.STEP_BIT[last_substep])
             is_active = (group_num == current_group)
 
             if is_completed:
-                color = color_completed
-                cv2.line(image_output, (10, y_pos - 5), (15, y_pos), color, 2)
-                cv2.line(image_output, (15, y_pos), (25, y_pos - 12), color, 2)
+                color = _COL_GREEN
+                ops_gruppi.append(('line', (10, y_pos - 5), (15, y_pos), color, _ICON_THICKNESS))
+                ops_gruppi.append(('line', (15, y_pos), (25, y_pos - 12), color, _ICON_THICKNESS))
                 text_x = 30
             elif is_active:
-                color = color_active
-                cv2.circle(image_output, (15, y_pos - 5), 5, color, -1)
+                color = _COL_YELLOW
+                ops_gruppi.append(('circle', (15, y_pos - 5), 5, color, -1))
                 text_x = 30
             else:
-                color = color_pending
-                cv2.circle(image_output, (15, y_pos - 5), 5, color, 1)
+                color = _COL_WHITE
+                ops_gruppi.append(('circle', (15, y_pos - 5), 5, color, _PENDING_THICKNESS))
                 text_x = 30
 
-            cv2.putText(image_output, group_name, (text_x, y_pos),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1)
+            ops_gruppi.append(('text', group_name, (text_x, y_pos),
+                               _TEXT_SCALE, color, _TEXT_THICKNESS))
             y_pos += 25
 
-        instr_key = f'step{self.current_step}_instruction'
-        instruction_text = STRINGS.get(instr_key, '')
+        ops_istruzione = []
+        instruction_text = _INSTRUCTION_FOR_STEP.get(self.current_step, '')
         if instruction_text:
-            cv2.putText(image_output, instruction_text, (10, height - 15),
-                       cv2.FONT_HERSHEY_SIMPLEX, 0.5, color_instruction, 1)
-
-    def _draw_terminate_button(self, image_output, cache):
-        width = cache['config'].get('width', 630)
-        height = cache['config'].get('height', 320)
+            ops_istruzione.append(('text', instruction_text, (10, height - 15),
+                                   _TEXT_SCALE, _COL_CYAN, _TEXT_THICKNESS))
 
-        btn_w = 120
-        btn_h = 35
-        btn_x = width - btn_w - 10
-        btn_y = height - btn_h - 10
-
-        self.exit_button_rect = (btn_x, btn_y, btn_w, btn_h)
-
-        cv2.rectangle(image_output, (btn_x, btn_y), (btn_x + btn_w, btn_y + btn_h),
-                     get_colore('red'), -1)
-        cv2.rectangle(image_output, (btn_x, btn_y), (btn_x + btn_w, btn_y + btn_h),
-                     get_colore('white'), 2)
-
-        text = STRINGS['btn_terminate']
-        font_scale = 0.7
-        thickness = 2
-        text_size = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX, font_scale, thickness)[0]
-        text_x = btn_x + (btn_w - text_size[0]) // 2
-        text_y = btn_y + (btn_h + text_size[1]) // 2
-
-        cv2.putText(image_output, text, (text_x, text_y),
-                   cv2.FONT_HERSHEY_SIMPLEX, font_scale, get_colore('white'), thickness)
+        return ops_gruppi, ops_istruzione
 
     # =========================================================================
     # STEP 1: CALIBRAZIONE BUIO
     # =========================================================================
 
     def _handle_click_step1(self, x, y, cache):
-        logging.info(f"Step 1 (buio) - Click: ({x}, {y})")
+        logging.info("Step 1 (buio) - Click: (%s, %s)", x, y)
         px_lux_dark = cache.get('calib_px_lux_dark', 0)
         self.cache['config']['px_lux_dark'] = px_lux_dark
-        logging.info(f"Step 1: px_lux_dark = {px_lux_dark:.3f}")
-        self._log(f"Step 1 - BUIO: px_lux_dark={px_lux_dark:.3f}")
+        self._config_dirty = True
+        logging.info("Step 1: px_lux_dark = %.3f", px_lux_dark)
+        self._log("Step 1 - BUIO: px_lux_dark=%.3f", px_lux_dark)
         self._advance_to_next_step()
         return False
 
@@ -248,7 +347,7 @@ class CalibrationManager:
     # =========================================================================
 
     def _handle_click_step20(self, x, y, cache):
-        logging.info(f"Step 20 - Click ricevuto")
+        logging.info("Step 20 - Click ricevuto")
         self._advance_to_next_step()
         return False
 
@@ -263,7 +362,7 @@ class CalibrationManager:
             self.step_data['autoexp_reset_done'] = True
         if cache.get('autoexp_ok', False):
             exp = cache['config'].get('exposure_absolute', 0)
-            self._log(f"Step 21 - AUTOEXP OK: exp={int(exp)} msg={cache.get('autoexp_debug_msg','')}")
+            self._log("Step 21 - AUTOEXP OK: exp=%d msg=%s", exp, cache.get('autoexp_debug_msg', ''))
             self._advance_to_next_step()
 
     # =========================================================================
@@ -271,20 +370,15 @@ class CalibrationManager:
     # =========================================================================
 
     def _handle_click_step22(self, x, y, cache):
-        logging.info(f"Step 22 (centraggio) - Click: ({x}, {y})")
-        self._log(f"Step 22 - CENTRO: crop_center=({x}, {y})")
+        logging.info("Step 22 (centraggio) - Click: (%s, %s)", x, y)
+        self._log("Step 22 - CENTRO: crop_center=(%s, %s)", x, y)
+        # Effettivo subito (preprocess legge la config in memoria) e scritto
+        # subito su config.json: resta salvato anche se la calibrazione
+        # viene interrotta prima della fine
         self.cache['config']['crop_center'] = [x, y]
-
-        try:
-            with open(self.config_file, 'w') as f:
-                json.dump(self.cache['config'], f, indent=4)
-            logging.info(f"crop_center salvato: ({x}, {y})")
-        except Exception as e:
-            logging.error(f"Errore nel salvare config.json: {e}")
-
-        init_config = self.cache.get('init_config')
-        if init_config:
-            init_config("config.json")
+        self._config_dirty = True
+        if self._salva_config():
+            logging.info("crop_center salvato: (%s, %s)", x, y)
 
         self._advance_to_next_step()
         return False
@@ -294,7 +388,7 @@ class CalibrationManager:
     # =========================================================================
 
     def _handle_click_step30(self, x, y, cache):
-        logging.info(f"Step 30 - Click ricevuto")
+        logging.info("Step 30 - Click ricevuto")
         self._advance_to_next_step()
         return False
 
@@ -310,9 +404,11 @@ class CalibrationManager:
         if cache.get('autoexp_ok', False):
             px_lux_bright_abb = cache.get('calib_px_lux_bright_abb', 0)
             self.cache['config']['px_lux_bright_abb'] = px_lux_bright_abb
-            logging.info(f"Step 31: px_lux_bright_abb = {px_lux_bright_abb:.3f}")
+            self._config_dirty = True
+            logging.info("Step 31: px_lux_bright_abb = %.3f", px_lux_bright_abb)
             exp = cache['config'].get('exposure_absolute', 0)
-            self._log(f"Step 31 - AUTOEXP OK (abbagliante): exp={int(exp)} px_lux_bright_abb={px_lux_bright_abb:.3f} msg={cache.get('autoexp_debug_msg','')}")
+            self._log("Step 31 - AUTOEXP OK (abbagliante): exp=%d px_lux_bright_abb=%.3f msg=%s",
+                      exp, px_lux_bright_abb, cache.get('autoexp_debug_msg', ''))
             self._advance_to_next_step()
 
     # =========================================================================
@@ -320,7 +416,7 @@ class CalibrationManager:
     # =========================================================================
 
     def _handle_click_step40(self, x, y, cache):
-        logging.info(f"Step 40 - Click ricevuto")
+        logging.info("Step 40 - Click ricevuto")
         self._advance_to_next_step()
         return False
 
@@ -335,7 +431,8 @@ class CalibrationManager:
             self.step_data['autoexp_reset_done'] = True
         if cache.get('autoexp_ok', False):
             exp = cache['config'].get('exposure_absolute', 0)
-            self._log(f"Step 41 - AUTOEXP OK (anabb incl -4%): exp={int(exp)} msg={cache.get('autoexp_debug_msg','')}")
+            self._log("Step 41 - AUTOEXP OK (anabb incl -4%%): exp=%d msg=%s",
+                      exp, cache.get('autoexp_debug_msg', ''))
             self._complete_calibration(cache)
 
     def _complete_calibration(self, cache):
@@ -354,7 +451,7 @@ class CalibrationManager:
             return
 
         self.cache['config']['y_calib_m'] = calib_m
-        logging.info(f"Step 41: y_calib_m={calib_m:.3f} px/%")
+        logging.info("Step 41: y_calib_m=%.3f px/%%", calib_m)
 
         px_lux_dark = self.cache['config'].get('px_lux_dark', 0)
         luxnom = float(cache.get('stato_comunicazione', {}).get('luxnom', 0))
@@ -369,10 +466,10 @@ class CalibrationManager:
             lux_q = -lux_m * px_lux_dark
             self.cache['config']['lux_m'] = lux_m
             self.cache['config']['lux_q'] = lux_q
-            logging.info(f"lux anabb: lux_m={lux_m:.4f}, lux_q={lux_q:.4f} "
-                        f"(dark={px_lux_dark:.3f}, bright={px_lux_bright:.3f})")
+            logging.info("lux anabb: lux_m=%.4f, lux_q=%.4f (dark=%.3f, bright=%.3f)",
+                         lux_m, lux_q, px_lux_dark, px_lux_bright)
         else:
-            logging.warning(f"Calibrazione lux anabb non possibile (delta={delta:.3f}, luxnom={luxnom:.1f})")
+            logging.warning("Calibrazione lux anabb non possibile (delta=%.3f, luxnom=%.1f)", delta, luxnom)
 
         # --- lux_m_abb, lux_q_abb per abbagliante ---
         px_lux_bright_abb = self.cache['config'].get('px_lux_bright_abb', 0)
@@ -382,31 +479,25 @@ class CalibrationManager:
             lux_q_abb = -lux_m_abb * px_lux_dark
             self.cache['config']['lux_m_abb'] = lux_m_abb
             self.cache['config']['lux_q_abb'] = lux_q_abb
-            logging.info(f"lux abb: lux_m_abb={lux_m_abb:.4f}, lux_q_abb={lux_q_abb:.4f} "
-                        f"(bright_abb={px_lux_bright_abb:.3f})")
+            logging.info("lux abb: lux_m_abb=%.4f, lux_q_abb=%.4f (bright_abb=%.3f)",
+                         lux_m_abb, lux_q_abb, px_lux_bright_abb)
         else:
-            logging.warning(f"Calibrazione lux abb non possibile (delta={delta_abb:.3f}, luxnom={luxnom:.1f})")
+            logging.warning("Calibrazione lux abb non possibile (delta=%.3f, luxnom=%.1f)", delta_abb, luxnom)
 
         cfg = self.cache['config']
-        self._log(f"Step 41 - RISULTATI CALIBRAZIONE:")
-        self._log(f"  px_lux_dark={cfg.get('px_lux_dark', 0):.3f}")
-        self._log(f"  px_lux_bright={cfg.get('px_lux_bright', 0):.3f}")
-        self._log(f"  px_lux_bright_abb={cfg.get('px_lux_bright_abb', 0):.3f}")
-        self._log(f"  y_calib_m={cfg.get('y_calib_m', 0):.4f}")
-        self._log(f"  lux_m={cfg.get('lux_m', 0):.4f}  lux_q={cfg.get('lux_q', 0):.4f}")
-        self._log(f"  lux_m_abb={cfg.get('lux_m_abb', 0):.4f}  lux_q_abb={cfg.get('lux_q_abb', 0):.4f}")
-        self._log(f"  crop_center={cfg.get('crop_center')}")
-
-        try:
-            with open(self.config_file, 'w') as f:
-                json.dump(self.cache['config'], f, indent=4)
-            logging.info("Calibrazione salvata in config.json")
-        except Exception as e:
-            logging.error(f"Errore nel salvare config.json: {e}")
-
-        init_config = self.cache.get('init_config')
-        if init_config:
-            init_config("config.json")
+        self._log("Step 41 - RISULTATI CALIBRAZIONE:")
+        self._log("  px_lux_dark=%.3f", cfg.get('px_lux_dark', 0))
+        self._log("  px_lux_bright=%.3f", cfg.get('px_lux_bright', 0))
+        self._log("  px_lux_bright_abb=%.3f", cfg.get('px_lux_bright_abb', 0))
+        self._log("  y_calib_m=%.4f", cfg.get('y_calib_m', 0))
+        self._log("  lux_m=%.4f  lux_q=%.4f", cfg.get('lux_m', 0), cfg.get('lux_q', 0))
+        self._log("  lux_m_abb=%.4f  lux_q_abb=%.4f", cfg.get('lux_m_abb', 0), cfg.get('lux_q_abb', 0))
+        self._log("  crop_center=%s", cfg.get('crop_center'))
+
+        # Unico salvataggio della calibrazione (include crop_center dello step 22)
+        # cache['config'] resta la config attiva: nessuna rilettura del file appena scritto
+        self._config_dirty = True
+        self._salva_config()
 
         self._advance_to_next_step()
 
@@ -418,23 +509,13 @@ class CalibrationManager:
         if not self.calibration_active:
             return False
 
-        if self.current_step == 1:
-            return self._handle_click_step1(x, y, cache)
-        elif self.current_step == 20:
-            return self._handle_click_step20(x, y, cache)
-        elif self.current_step == 22:
-            return self._handle_click_step22(x, y, cache)
-        elif self.current_step == 30:
-            return self._handle_click_step30(x, y, cache)
-        elif self.current_step == 40:
-            return self._handle_click_step40(x, y, cache)
-
-        return False
+        fn = self._click_handlers.get(self.current_step)
+        return fn(x, y, cache) if fn else False
 
     def get_status(self):
         return {
             'active': self.calibration_active,
             'step': self.current_step,
-            'steps_completed': list(self.steps_completed),
+            'steps_completed': [s for s, bit in self.STEP_BIT.items() if self._completed_mask & bit],
             'data': self.step_data
         }
@@ -1,15 +1,128 @@
 import os
 import time
+import fcntl
+import ctypes
 
 import cv2
 import logging
 import numpy as np
-from utils import disegna_rettangolo, get_colore
+from utils import disegna_rettangolo, get_colore, njit, prange, NUMBA_DISPONIBILE
+
+
+# Controlli V4L2 impostati direttamente via ioctl (linux/videodev2.h)
+class _V4l2Control(ctypes.Structure):
+    _fields_ = [('id', ctypes.c_uint32), ('value', ctypes.c_int32)]
+
+
+_VIDIOC_S_CTRL = 0xC008561C  # _IOWR('V', 28, struct v4l2_control)
+_V4L2_CID = {
+    'brightness': 0x00980900,
+    'contrast': 0x00980901,
+    'saturation': 0x00980902,
+    'exposure_absolute': 0x009A0902,
+}
+
+# fd aperti per indice dispositivo, riusati per tutta la vita del processo
+_v4l2_fd = {}
+
+
+def set_ctrl(indice, nome, valore):
+    """
+    Imposta un controllo V4L2 su /dev/video{indice} con un singolo ioctl
+    VIDIOC_S_CTRL sul fd persistente. Se il dispositivo o l'ioctl non sono
+    disponibili ripiega su v4l2-ctl.
+
+    Returns:
+        True se impostato via ioctl, False se è stato usato v4l2-ctl
+    """
+    valore = int(valore)
+    try:
+        fd = _v4l2_fd.get(indice)
+        if fd is None:
+            fd = os.open(f"/dev/video{indice}", os.O_RDWR | os.O_NONBLOCK)
+            _v4l2_fd[indice] = fd
+        fcntl.ioctl(fd, _VIDIOC_S_CTRL, _V4l2Control(_V4L2_CID[nome], valore))
+        return True
+    except OSError as e:
+        logging.debug("ioctl %s su /dev/video%s fallito (%s), uso v4l2-ctl", nome, indice, e)
+        os.system(f"v4l2-ctl --device /dev/video{indice} --set-ctrl={nome}={valore}")
+        return False
+
+
+@njit(parallel=True, cache=True, nogil=True)
+def _ae_stats(pixels, lo, hi):
+    """
+    Statistiche autoexp in un solo passaggio sui pixel (immagine 2D):
+    massimo dei pixel non saturi (-1 se tutti saturi) e numero di pixel
+    in [lo, hi]. Riduzione per riga, poi sulle righe.
+    Da usare solo con numba (NUMBA_DISPONIBILE), altrimenti è Python puro.
+    """
+    h, w = pixels.shape
+    max_riga = np.empty(h, dtype=np.int64)
+    n_riga = np.empty(h, dtype=np.int64)
+    for y in prange(h):
+        mx = -1
+        n = 0
+        for x in range(w):
+            v = pixels[y, x]
+            if v < 255 and v > mx:
+                mx = v
+            if lo <= v <= hi:
+                n += 1
+        max_riga[y] = mx
+        n_riga[y] = n
+    return max_riga.max(), n_riga.sum()
+
+
+def _clamp(v, lo, hi):
+    """Limita lo scalare v a [lo, hi] (senza passare da np.clip)."""
+    return lo if v < lo else hi if v > hi else v
+
+
+# Ultimo indice camera aperto con successo, provato per primo all'avvio
+_FILE_ULTIMA_CAMERA = os.path.expanduser("~/.cache/centrafari/last_camera")
+
+
+def _leggi_ultima_camera():
+    try:
+        with open(_FILE_ULTIMA_CAMERA) as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def _salva_ultima_camera(i):
+    try:
+        os.makedirs(os.path.dirname(_FILE_ULTIMA_CAMERA), exist_ok=True)
+        tmp = _FILE_ULTIMA_CAMERA + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(str(i))
+        os.replace(tmp, _FILE_ULTIMA_CAMERA)
+    except OSError as e:
+        logging.debug("Impossibile salvare l'ultima camera: %s", e)
+
 
 def apri_camera():
+    """
+    Apre la prima camera disponibile tra /dev/video0..10, provando prima
+    l'ultimo indice che ha funzionato (scansione completa solo se fallisce).
+    """
+    ultima = _leggi_ultima_camera()
+    if ultima is not None:
+        video = cv2.VideoCapture(ultima)
+        if video.isOpened():
+            # Un solo buffer V4L2: si elabora sempre il frame più recente
+            video.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            return ultima, video
+        video.release()
+
     for i in range(11):
+        if i == ultima:
+            continue
         video = cv2.VideoCapture(i)
         if video.isOpened():
+            video.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            _salva_ultima_camera(i)
             return i, video
 
     return None, None
@@ -19,10 +132,8 @@ def set_camera(i, config):
     logging.info(f"set_camera /dev/video{i}")
     try:
         #os.system(f"v4l2-ctl --device /dev/video{i} --set-ctrl=exposure_auto={config['exposure_auto']}")
-        os.system(f"v4l2-ctl --device /dev/video{i} --set-ctrl=brightness={config['brightness']}")
-        os.system(f"v4l2-ctl --device /dev/video{i} --set-ctrl=contrast={config['contrast']}")
-        os.system(f"v4l2-ctl --device /dev/video{i} --set-ctrl=saturation={config['saturation']}")
-        os.system(f"v4l2-ctl --device /dev/video{i} --set-ctrl=exposure_absolute={config['exposure_absolute']}")
+        for nome in ('brightness', 'contrast', 'saturation', 'exposure_absolute'):
+            set_ctrl(i, nome, config[nome])
         os.system(f"v4l2-ctl --device /dev/video{i} --list-ctrls")
     except Exception as e:
         logging.error(f"error: {e}")
@@ -48,14 +159,15 @@ def autoexp_legacy(image_input,image_view,cache):
                  cache['config']['exposure_absolute']=cache['config']['exposure_absolute']*0.998
             if (r<=237):
                 cache['config']['exposure_absolute'] = cache['config']['exposure_absolute'] * 1.002
-        logging.debug(f"exp: {cache['config']['exposure_absolute']}")
+        logging.debug("exp: %s", cache['config']['exposure_absolute'])
         if cache['config']['exposure_absolute']<50:
             cache['config']['exposure_absolute']=50
         if cache['config']['exposure_absolute'] >10000:
             cache['config']['exposure_absolute'] = 10000
 
         if exp_old!=cache['config']['exposure_absolute']:
-                os.system(f"v4l2-ctl --device /dev/video{cache['config']['indice_camera']} --set-ctrl=exposure_absolute={cache['config']['exposure_absolute']}")
+                set_ctrl(cache['config']['indice_camera'], 'exposure_absolute',
+                         cache['config']['exposure_absolute'])
                 time.sleep(0.1)
 
         if cache['DEBUG']:
@@ -91,10 +203,10 @@ def autoexp(image_input, image_view, cache):
         cache['autoexp_fake_t0'] = None
         exp_start = cache['config'].get('autoexp_exp_start', 200)
         cache['config']['exposure_absolute'] = exp_start
-        os.system(f"v4l2-ctl --device /dev/video0 "
-                  f"--set-ctrl=exposure_absolute={int(exp_start)}")
+        set_ctrl(cache['config'].get('indice_camera', 0), 'exposure_absolute', exp_start)
 
     config = cache['config']
+    indice = config.get('indice_camera', 0)
     pid = cache.get('autoexp_pid')
 
     # Inizializza stato PID al primo frame
@@ -118,14 +230,32 @@ def autoexp(image_input, image_view, cache):
     integral_max = config.get('autoexp_integral_max', 2.0)
 
     try:
-        valid = image_input[image_input < 255]
-        r = np.max(valid) if len(valid) > 0 else 255
+        # Statistiche su un pixel ogni autoexp_subsample per lato (1 = tutti),
+        # canali trattati come un'unica immagine 2D
+        passo = int(config.get('autoexp_subsample', 1))
+        campione = image_input[::passo, ::passo] if passo > 1 else image_input
+        pixels = campione.reshape(campione.shape[0], -1)
+        if NUMBA_DISPONIBILE:
+            # Massimo dei non saturi e conteggio nel range in un solo passaggio
+            r, in_range = _ae_stats(pixels, setpoint - stable_tol, setpoint + stable_tol)
+            r = int(r) if r >= 0 else 255
+        else:
+            # Maschere in buffer scratch preallocati (niente array booleani temporanei)
+            mask = cache.get('autoexp_mask')
+            if mask is None or mask.shape != pixels.shape:
+                mask = np.empty(pixels.shape, dtype=np.uint8)
+                cache['autoexp_mask'] = mask
+
+            # Massimo dei pixel non saturi
+            cv2.inRange(pixels, 0, 254, dst=mask)
+            r = int(cv2.minMaxLoc(pixels, mask)[1]) if cv2.countNonZero(mask) else 255
+            cv2.inRange(pixels, setpoint - stable_tol, setpoint + stable_tol, dst=mask)
+            in_range = cv2.countNonZero(mask)
         exp_old = config['exposure_absolute']
         max_corr = config.get('autoexp_max_corr', 0.2)
         perc_target = config.get('autoexp_perc_target', 0.5)
         perc_tol = config.get('autoexp_perc_tol', 1.0)
-        in_range = np.sum((image_input >= setpoint - stable_tol) & (image_input <= setpoint + stable_tol))
-        perc = in_range / image_input.size * 100
+        perc = in_range / pixels.size * 100
         perc_ok = abs(perc - perc_target) <= perc_tol
 
         use_perc_pid = config.get('autoexp_use_perc_pid', True)
@@ -135,14 +265,15 @@ def autoexp(image_input, image_view, cache):
             kp_eff = config.get('autoexp_Kp_fine', Kp / 2) if perc_ok else Kp
             error = (perc_target - perc) / perc_target
             pid['integral'] += error
-            pid['integral'] = np.clip(pid['integral'], -integral_max, integral_max)
+            pid['integral'] = _clamp(pid['integral'], -integral_max, integral_max)
             derivative = error - pid['prev_error']
             pid['prev_error'] = error
-            correction = np.clip(kp_eff * error + Ki * pid['integral'] + Kd * derivative, -max_corr, max_corr)
-            exp_new = np.clip(exp_old * (1.0 + correction), exp_min, exp_max)
+            correction = _clamp(kp_eff * error + Ki * pid['integral'] + Kd * derivative, -max_corr, max_corr)
+            exp_new = _clamp(exp_old * (1.0 + correction), exp_min, exp_max)
             if exp_new != exp_old:
                 config['exposure_absolute'] = float(exp_new)
-                os.system(f"v4l2-ctl --device /dev/video0 --set-ctrl=exposure_absolute={int(exp_new)}")
+                set_ctrl(indice, 'exposure_absolute', exp_new)
+                # Assestamento: i frame successivi devono avere la nuova esposizione
                 time.sleep(0.1)
             if perc_ok:
                 if pid['stable_since'] is None:
@@ -160,13 +291,14 @@ def autoexp(image_input, image_view, cache):
             else:
                 error = (setpoint - r) / setpoint
                 pid['integral'] += error
-                pid['integral'] = np.clip(pid['integral'], -integral_max, integral_max)
+                pid['integral'] = _clamp(pid['integral'], -integral_max, integral_max)
                 derivative = error - pid['prev_error']
                 pid['prev_error'] = error
-                correction = np.clip(Kp * error + Ki * pid['integral'] + Kd * derivative, -max_corr, max_corr)
-                exp_new = np.clip(exp_old * (1.0 + correction), exp_min, exp_max)
+                correction = _clamp(Kp * error + Ki * pid['integral'] + Kd * derivative, -max_corr, max_corr)
+                exp_new = _clamp(exp_old * (1.0 + correction), exp_min, exp_max)
                 config['exposure_absolute'] = float(exp_new)
-                os.system(f"v4l2-ctl --device /dev/video0 --set-ctrl=exposure_absolute={int(exp_new)}")
+                set_ctrl(indice, 'exposure_absolute', exp_new)
+                # Assestamento: i frame successivi devono avere la nuova esposizione
                 time.sleep(0.1)
             if abs(r - setpoint) <= stable_tol:
                 if pid['stable_since'] is None:
@@ -181,14 +313,16 @@ def autoexp(image_input, image_view, cache):
         cache['autoexp_debug_msg'] = f"max:{r} perc:{perc:.2f}% exp:{int(exp_new)} px_lux:{px_lux:.1f} [{ok_str}]"
 
     except Exception as e:
-        logging.error(f"autoexp PID error: {e}")
+        logging.error("autoexp PID error: %s", e)
         cache['autoexp_ok'] = False
 
     return image_view
 
 
 def fixexp(cache,ctr):
-    os.system(f"v4l2-ctl --device /dev/video{cache['config']['indice_camera']} --set-ctrl=exposure_absolute={ctr}")
+    set_ctrl(cache['config']['indice_camera'], 'exposure_absolute', ctr)
+    # Attesa di assestamento prima dei frame successivi (chiamata ad ogni
+    # frame da MW28912_centra_telecamera.show_frame)
     time.sleep(0.25)
 
 
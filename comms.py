@@ -5,6 +5,7 @@ Gestisce connessione persistente con invio continuo dati e ricezione asincrona.
 
 import socket
 import select
+import struct
 import logging
 
 
@@ -12,9 +13,52 @@ import logging
 # FORMATO MESSAGGI
 # Se True usa nuovo formato: "x 123; y 456; lux 0.50; ..."
 # Se False usa vecchio formato: "XYL 123 456 0.50 ..."
+# Se 'bin' usa formato binario _TX_BIN (28 byte, little endian):
+#   x, y, lux, roll, yaw, pitch float32; left, right, up, down uint8
+#   Idle (nessun dato) = stesso record con i 6 float NaN e indicatori a 0,
+#   così lo stream resta diviso in record da 28 byte
 # =============================================================================
 USE_NEW_FORMAT = True
 
+_TX_BIN = struct.Struct('<6f4B')
+_TX_BIN_IDLE = _TX_BIN.pack(*([float('nan')] * 6), 0, 0, 0, 0)
+
+
+# =============================================================================
+# ULTIMO DATO ELABORAZIONE -> COMMS
+# Un solo slot cache['tx_dato'] = (seq, valori nell'ordine di TX_CAMPI),
+# sovrascritto ad ogni frame dal thread di elaborazione con un'unica
+# assegnazione (atomica): comms legge solo il valore più recente.
+# =============================================================================
+TX_CAMPI = ('posiz_pattern_x', 'posiz_pattern_y', 'px_lux', 'yaw', 'pitch', 'roll',
+            'left', 'right', 'up', 'down')
+
+
+def init_tx_dato(cache):
+    """Inizializza cache['tx_dato'] (seq 0 = nessun dato pubblicato)."""
+    cache['tx_dato'] = (0, None)
+
+
+def pubblica_dato(cache, valori):
+    """
+    Pubblica la tupla valori (ordine TX_CAMPI) con il numero di sequenza
+    successivo. Un solo produttore (thread di elaborazione).
+    """
+    cache['tx_dato'] = (cache['tx_dato'][0] + 1, valori)
+
+
+def ultimo_dato(cache, tail):
+    """
+    Ultimo dato pubblicato, se più recente di tail.
+
+    Returns:
+        (seq, dict per encode_response) oppure (tail, None) se nessun dato nuovo
+    """
+    seq, valori = cache['tx_dato']
+    if seq == tail:
+        return tail, None
+    return seq, dict(zip(TX_CAMPI, valori))
+
 
 def encode_response(p, cache=None):
     """
@@ -27,7 +71,7 @@ def encode_response(p, cache=None):
         cache: Cache con config e stato_comunicazione (per calibrazione e UM)
 
     Returns:
-        Stringa formattata secondo USE_NEW_FORMAT
+        Stringa formattata secondo USE_NEW_FORMAT (bytes se 'bin')
     """
     # Estrai valori pixel
     pixel_x = p['posiz_pattern_x']
@@ -91,6 +135,9 @@ def encode_response(p, cache=None):
         elif umb == 2:  # KLux/1m = lux × 625 / 1000
             out_lux = lux_cal * 0.625
 
+    if USE_NEW_FORMAT == 'bin':
+        return _TX_BIN.pack(out_x, out_y, out_lux, p['roll'], p['yaw'], p['pitch'],
+                            p['left'], p['right'], p['up'], p['down'])
     if USE_NEW_FORMAT:
         msg = (
             f"x {out_x:.2f}; "
@@ -114,6 +161,16 @@ def encode_response(p, cache=None):
     return msg[:278]
 
 
+def messaggio_tx(p, cache=None):
+    """
+    Messaggio da trasmettere, già in bytes: dati codificati con
+    encode_response, oppure idle se p è vuoto (record sentinella in 'bin').
+    """
+    if USE_NEW_FORMAT == 'bin':
+        return encode_response(p, cache) if p else _TX_BIN_IDLE
+    return (encode_response(p, cache) if p else "idle ").encode()
+
+
 def decode_cmd(resp):
     """Decodifica vecchio formato CFG->..."""
     stato_comunicazione = {}
@@ -132,16 +189,48 @@ def decode_cmd1(resp, commands):
     Decodifica comandi con formato: parametro valore; parametro2 valore2;
     Esempio: croce 1; run 0; tipo_faro anabbagliante; incl 00000;
     """
-    parts = resp.split(';')
-    for part in parts:
-        part = part.strip()
-        if not part:
-            continue
-        tokens = part.split(' ', 1)
-        if len(tokens) == 2:
-            parametro = tokens[0].strip()
-            valore = tokens[1].strip()
-            commands[parametro] = valore
+    for part in resp.split(';'):
+        # partition: niente lista intermedia; sep vuoto = parte senza valore
+        parametro, sep, valore = part.strip().partition(' ')
+        if sep:
+            commands[parametro.rstrip()] = valore.strip()
+
+
+# Parametri numerici ricevuti come stringa e convertiti una volta in ricezione
+_PARAMETRI_INT = ('TOH', 'TOV', 'rot', 'UMI', 'UMH', 'UMB', 'index')
+_PARAMETRI_FLOAT = ('luxnom', 'luxnom_abb')
+
+
+def converti_tipi(comandi, config):
+    """
+    Converte in int/float i parametri numerici decodificati da decode_cmd1,
+    così il ciclo frame li legge senza int() ad ogni frame.
+    I valori non convertibili vengono scartati (resta il valore precedente).
+
+    Args:
+        comandi: Dict parametro -> valore stringa (modificato in place)
+        config: Config (y_calib_m per la conversione di incl)
+    """
+    # Converti incl da % a pixel
+    if 'incl' in comandi:
+        try:
+            incl_percent = float(comandi['incl'])
+            comandi['incl'] = int(incl_percent * config.get('y_calib_m', 1.0))
+        except ValueError:
+            del comandi['incl']
+    for key in _PARAMETRI_INT:
+        if key in comandi:
+            try:
+                comandi[key] = int(comandi[key])
+            except ValueError:
+                del comandi[key]
+    for key in _PARAMETRI_FLOAT:
+        if key in comandi:
+            try:
+                comandi[key] = float(comandi[key])
+            except ValueError:
+                del comandi[key]
+    # lato, tipo_faro, pattern, croce, run, save rimangono stringhe
 
 
 def thread_comunicazione(port, cache):
@@ -157,6 +246,7 @@ def thread_comunicazione(port, cache):
 
     conn = None
     last_data = None
+    tx_tail = 0
 
     while True:
         cycle_start = time.monotonic()
@@ -170,6 +260,8 @@ def thread_comunicazione(port, cache):
         if conn is None:
             try:
                 conn = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                # Messaggio piccolo seguito da attesa risposta: niente Nagle
+                conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
                 conn.connect((config.get('ip', "localhost"), port))
                 logging.info(f"Connesso a {config.get('ip')}:{port}")
 
@@ -184,21 +276,15 @@ def thread_comunicazione(port, cache):
 
         # === TX: INVIO DATI ===
         try:
-            # Svuota coda e prendi ultimo valore
-            while True:
-                try:
-                    last_data = cache['queue'].get_nowait()
-                except:
-                    break
+            # Prendi ultimo valore pubblicato (se nuovo)
+            tx_tail, dato = ultimo_dato(cache, tx_tail)
+            if dato is not None:
+                last_data = dato
 
             # Manda ultimo dato (o idle se nessun dato)
-            if last_data:
-                msg = encode_response(last_data, cache)
-            else:
-                msg = "idle "
-
-            conn.sendall(msg.encode())
-            logging.debug(f"[TX] {msg}")
+            msg = messaggio_tx(last_data, cache)
+            conn.sendall(msg)
+            logging.debug("[TX] %s", msg)
 
         except (BrokenPipeError, ConnectionResetError, OSError) as e:
             logging.error(f"Errore invio: {e}")
@@ -215,34 +301,23 @@ def thread_comunicazione(port, cache):
             if ready:
                 data = conn.recv(1024).decode("UTF-8")
                 if data:
-                    logging.info(f"[RX] {data}")
-                    decode_cmd1(data, cache['stato_comunicazione'])
-                    # Converti incl da % a pixel
-                    if 'incl' in cache['stato_comunicazione']:
-                        incl_percent = float(cache['stato_comunicazione']['incl'])
-                        calib_m = cache['config'].get('y_calib_m', 1.0)
-                        cache['stato_comunicazione']['incl'] = int(incl_percent * calib_m)
-                    # Converti luxnom e luxnom_abb in float
-                    for key in ('luxnom', 'luxnom_abb'):
-                        if key in cache['stato_comunicazione']:
-                            try:
-                                cache['stato_comunicazione'][key] = float(cache['stato_comunicazione'][key])
-                            except ValueError:
-                                pass
-                    # Converti index in int
-                    if 'index' in cache['stato_comunicazione']:
-                        try:
-                            cache['stato_comunicazione']['index'] = int(cache['stato_comunicazione']['index'])
-                        except ValueError:
-                            pass
-                    # lato rimane stringa (es. "dx", "sx")
+                    logging.info("[RX] %s", data)
+                    # Decodifica e conversione tipi su un dict temporaneo, poi un solo
+                    # update: il thread di acquisizione non vede mai valori ancora stringa
+                    comandi = {}
+                    decode_cmd1(data, comandi)
+                    converti_tipi(comandi, cache['config'])
+                    cache['stato_comunicazione'].update(comandi)
+                    # Geometria croce da ricalcolare se cambiano inclinazione o tolleranze
+                    if not comandi.keys().isdisjoint(('incl', 'TOH', 'TOV')):
+                        cache['croce_dirty'] = True
                 else:
                     logging.warning("Connessione chiusa dal server")
                     conn.close()
                     conn = None
                     continue
             else:
-                logging.warning(f"[RX] Timeout ({timeout_ms}ms) - nessuna risposta")
+                logging.warning("[RX] Timeout (%sms) - nessuna risposta", timeout_ms)
 
         except (BlockingIOError, socket.error):
             pass
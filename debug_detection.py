@@ -3,17 +3,16 @@
 
 import cv2
 import numpy as np
-import json
 import sys
 import os
 
 sys.path.insert(0, '/home/user/centrafari')
 import fari_detection
 from funcs_misc import is_punto_ok, preprocess
+from utils import carica_json
 
 # Carica config
-with open('/home/user/centrafari/config.json', 'r') as f:
-    config = json.load(f)
+config = carica_json('/home/user/centrafari/config.json')
 
 # Simula cache
 cache = {
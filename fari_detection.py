@@ -14,6 +14,7 @@ Architettura:
 import cv2
 import numpy as np
 import logging
+from functools import partial
 from typing import Tuple, Optional, List, Dict
 from scipy.optimize import curve_fit
 from funcs_misc import is_punto_ok
@@ -224,7 +225,8 @@ def detect_anabbagliante(image_input: np.ndarray,
         sym_mask = top_pts[:, 0] >= x_left_sym
         top_pts = top_pts[sym_mask]
 
-        logging.debug(f"anabbagliante - X0_prev:{X0_prev:.1f} bounds:[{left_bound}, {right_bound}] sym_left:{x_left_sym:.1f}")
+        logging.debug("anabbagliante - X0_prev:%.1f bounds:[%s, %s] sym_left:%.1f",
+                      X0_prev, left_bound, right_bound, x_left_sym)
 
         x_data = top_pts[:, 0]
         y_data = top_pts[:, 1]
@@ -265,7 +267,7 @@ def detect_anabbagliante(image_input: np.ndarray,
         }
 
     except Exception as e:
-        logging.error(f"Errore detect_anabbagliante: {e}")
+        logging.error("Errore detect_anabbagliante: %s", e)
         return {
             'tipo': 'anabbagliante',
             'punto': None,
@@ -335,7 +337,8 @@ def detect_fendinebbia(image_input: np.ndarray,
         left_bound = np.maximum(x_min, cache['l_bound']) + marginl
         right_bound = np.minimum(x_max, cache['r_bound']) - marginl
 
-        logging.debug(f"fendinebbia - X0:{cache['X0']}, bounds:[{left_bound}, {right_bound}] l_bound:{cache['l_bound']} r_bound:{cache['r_bound']}")
+        logging.debug("fendinebbia - X0:%s, bounds:[%s, %s] l_bound:%s r_bound:%s",
+                      cache['X0'], left_bound, right_bound, cache['l_bound'], cache['r_bound'])
 
         # Filtra punti nella ROI
         mask = (pts[:, 0] >= left_bound) & (pts[:, 0] <= right_bound)
@@ -381,7 +384,7 @@ def detect_fendinebbia(image_input: np.ndarray,
         }
 
     except Exception as e:
-        logging.error(f"Errore detect_fendinebbia: {e}")
+        logging.error("Errore detect_fendinebbia: %s", e)
         return {
             'tipo': 'fendinebbia',
             'punto': None,
@@ -447,7 +450,7 @@ def detect_abbagliante(image_input: np.ndarray,
         if contours:
             contorni = contours
     except Exception as e:
-        logging.error(f"detect_abbagliante: errore findContours: {e}")
+        logging.error("detect_abbagliante: errore findContours: %s", e)
 
     # Calcola angoli
     try:
@@ -526,12 +529,10 @@ def draw_results(image_output: np.ndarray,
             # Disegna i punti usati per il fit con colore dinamico (verde/giallo/rosso)
             punti_fitted = results.get('punti_fitted', np.array([]))
             if len(punti_fitted) > 1:
-                # Ordina punti per X per disegnarli come linea continua
+                # Ordina punti per X e disegnali come un'unica polilinea
                 fitted_sorted = punti_fitted[punti_fitted[:, 0].argsort()]
-                for i in range(len(fitted_sorted) - 1):
-                    pt1 = tuple(fitted_sorted[i].astype(int))
-                    pt2 = tuple(fitted_sorted[i + 1].astype(int))
-                    cv2.line(image_output, pt1, pt2, color, 2, lineType=cv2.LINE_AA)
+                cv2.polylines(image_output, [fitted_sorted.astype(np.int32)], False,
+                              color, 2, lineType=cv2.LINE_AA)
         except:
             pass
 
@@ -551,9 +552,9 @@ def draw_results(image_output: np.ndarray,
         # Disegna punti fitted (solo per anabbagliante/fendinebbia)
         punti_fitted = results.get('punti_fitted', np.array([]))
         if len(punti_fitted) > 0:
-            # Cancella punti originali
-            for p in punti_fitted:
-                image_output[int(p[1]), int(p[0])] = 0
+            # Cancella punti originali (indicizzazione vettoriale)
+            punti_int = punti_fitted.astype(int)
+            image_output[punti_int[:, 1], punti_int[:, 0]] = 0
 
             # Ridisegna punti colorati
             [cv2.circle(image_output, (int(p[0]), int(p[1])), 1, color, 1, lineType=cv2.LINE_AA)
@@ -562,6 +563,20 @@ def draw_results(image_output: np.ndarray,
     return image_output
 
 
+# ============================================================================
+# DISPATCH PER TIPO FARO
+# ============================================================================
+
+# tipo_faro -> detect(image_input, cache), parametri costanti già legati
+DETECTORS = {
+    'anabbagliante': partial(detect_anabbagliante, blur_ksize=5, canny_lo=40, canny_hi=120,
+                             ftol=1e-8, xtol=1e-8, maxfev=1000),
+    'fendinebbia': partial(detect_fendinebbia, blur_ksize=5, canny_lo=40, canny_hi=120,
+                           ftol=1e-8, xtol=1e-8, maxfev=1000),
+    'abbagliante': detect_abbagliante,
+}
+
+
 # ============================================================================
 # BACKWARD COMPATIBILITY - Wrapper per codice legacy
 # ============================================================================
@@ -0,0 +1,218 @@
+"""
+Modulo scambio frame via memoria condivisa MW28912.
+Sostituisce il passaggio tramite /tmp/frame.jpg: il processo di cattura scrive
+i frame BGR grezzi in un anello di slot in un segmento SharedMemory e i
+consumatori (MW28912, MW28912_centra_telecamera) li leggono come ndarray
+direttamente sul buffer (niente decodifica JPEG, niente I/O su disco).
+
+Layout segmento:
+    [0:8]    seq       uint64  numero dell'ultimo frame completo (0 = nessuno)
+    [8:16]   timestamp float64 time.monotonic() del produttore
+    [16:20]  height    uint32
+    [20:24]  width     uint32
+    [24:28]  n_slot    uint32
+    [32:]    slot      uint8   n_slot * height*width*3 (BGR), frame seq nello
+                               slot seq % n_slot
+
+Uso produttore (per sviluppo / cattura da VideoCapture):
+    python3 frame_shm.py [indice_camera] [n_slot]
+"""
+
+import os
+import sys
+import time
+import struct
+import logging
+from multiprocessing import shared_memory, resource_tracker
+
+import cv2
+import numpy as np
+
+# TurboJPEG opzionale: decodifica del fallback su file più veloce di cv2.imread
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGR
+    _tj = TurboJPEG()
+except (ImportError, RuntimeError, OSError):
+    _tj = None
+
+
+NOME_SHM_DEFAULT = "mw28912_frame"
+FRAME_PATH = "/tmp/frame.jpg"
+
+_HEADER = struct.Struct('<QdIII')
+HEADER_SIZE = 32
+
+# Slot dell'anello: il produttore scrive sempre nello slot successivo a quello
+# pubblicato, quindi un frame letto resta valido per n_slot - 1 frame successivi
+N_SLOT_DEFAULT = 4
+
+# Intervallo tra tentativi di aggancio al segmento (s)
+_RETRY_ATTACH = 1.0
+
+
+class FrameShm:
+    """
+    Segmento di memoria condivisa con un anello di frame BGR e il numero
+    dell'ultimo frame pubblicato.
+
+    Il produttore scrive il frame seq+1 nello slot (seq+1) % n_slot e solo a
+    copia completata pubblica il nuovo seq; il lettore prende lo slot
+    dell'ultimo seq pubblicato, che non viene riscritto per i successivi
+    n_slot - 1 frame.
+    """
+
+    def __init__(self, nome=NOME_SHM_DEFAULT, shape=None, n_slot=N_SLOT_DEFAULT):
+        """
+        Args:
+            nome: Nome del segmento (in /dev/shm)
+            shape: (height, width) per creare il segmento (produttore),
+                   None per agganciarsi a un segmento esistente (consumatore)
+            n_slot: Numero di slot dell'anello (solo produttore)
+        """
+        self.produttore = shape is not None
+        if self.produttore:
+            h, w = shape
+            self.shm = shared_memory.SharedMemory(
+                name=nome, create=True, size=HEADER_SIZE + n_slot * h * w * 3
+            )
+            self.seq = 0
+            _HEADER.pack_into(self.shm.buf, 0, 0, time.monotonic(), h, w, n_slot)
+        else:
+            self.shm = shared_memory.SharedMemory(name=nome)
+            # Il consumatore non deve distruggere il segmento all'uscita
+            resource_tracker.unregister(self.shm._name, 'shared_memory')
+            _, _, h, w, n_slot = _HEADER.unpack_from(self.shm.buf, 0)
+
+        self.shape = (h, w, 3)
+        self.n_slot = n_slot
+        self.slot = np.ndarray((n_slot,) + self.shape, dtype=np.uint8,
+                               buffer=self.shm.buf, offset=HEADER_SIZE)
+
+    def scrivi(self, frame):
+        """Copia un frame BGR nello slot successivo e pubblica il nuovo seq."""
+        np.copyto(self.slot[(self.seq + 1) % self.n_slot], frame)
+        self.seq += 1
+        struct.pack_into('<Qd', self.shm.buf, 0, self.seq, time.monotonic())
+
+    def seq_corrente(self):
+        return struct.unpack_from('<Q', self.shm.buf, 0)[0]
+
+    def leggi(self, ultimo_seq):
+        """
+        Ritorna (seq, frame) se c'è un frame nuovo, altrimenti (ultimo_seq, None).
+        Il frame è una view sullo slot, senza copia.
+        """
+        seq = self.seq_corrente()
+        if seq == 0 or seq == ultimo_seq:
+            return ultimo_seq, None
+        return seq, self.slot[seq % self.n_slot]
+
+    def valido(self, seq):
+        """True se lo slot del frame seq non è ancora stato riutilizzato dal produttore."""
+        return self.seq_corrente() - seq < self.n_slot - 1
+
+    def chiudi(self):
+        self.shm.close()
+        if self.produttore:
+            self.shm.unlink()
+
+
+def _decodifica_jpeg(percorso):
+    """
+    Legge e decodifica un JPEG in BGR (TurboJPEG se disponibile, altrimenti
+    cv2.imdecode). Ritorna None se il file è incompleto o non leggibile.
+    """
+    try:
+        with open(percorso, 'rb') as f:
+            buf = f.read()
+    except OSError:
+        return None
+    if _tj is not None:
+        try:
+            return _tj.decode(buf, pixel_format=TJPF_BGR)
+        except OSError:
+            # Frame scritto a metà dal produttore
+            return None
+    return cv2.imdecode(np.frombuffer(buf, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def leggi_frame(cache):
+    """
+    Legge il frame più recente per show_frame.
+
+    Usa il segmento SharedMemory se il produttore lo ha pubblicato,
+    altrimenti ripiega sulla decodifica di FRAME_PATH (solo se st_mtime_ns è cambiato).
+
+    Args:
+        cache: Dizionario cache (usa 'frame_shm', 'frame_seq', 'frame_mtime')
+
+    Returns:
+        Frame BGR oppure None se non disponibile o invariato
+    """
+    shm = cache.get('frame_shm')
+
+    if shm is None and time.monotonic() >= cache.get('frame_shm_retry', 0):
+        nome = cache['config'].get('frame_shm_name', NOME_SHM_DEFAULT)
+        try:
+            shm = FrameShm(nome)
+            cache['frame_shm'] = shm
+            cache['frame_seq'] = 0
+            logging.info(f"Agganciato segmento frame /dev/shm/{nome} {shm.shape}")
+        except FileNotFoundError:
+            cache['frame_shm_retry'] = time.monotonic() + _RETRY_ATTACH
+
+    if shm is None:
+        # Fallback su file: rilegge solo se il produttore ha scritto un nuovo frame
+        try:
+            mtime = os.stat(FRAME_PATH).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        if mtime == cache.get('frame_mtime'):
+            return None
+        frame = _decodifica_jpeg(FRAME_PATH)
+        if frame is not None:
+            cache['frame_mtime'] = mtime
+        return frame
+
+    cache['frame_seq'], frame = shm.leggi(cache['frame_seq'])
+    return frame
+
+
+def frame_valido(cache):
+    """
+    Verifica che il frame letto da leggi_frame non sia stato sovrascritto
+    dal produttore nel frattempo (da chiamare dopo averlo copiato).
+    """
+    shm = cache.get('frame_shm')
+    return shm is None or shm.valido(cache['frame_seq'])
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    indice_camera = int(sys.argv[1]) if len(sys.argv) >= 2 else 0
+    n_slot = int(sys.argv[2]) if len(sys.argv) >= 3 else N_SLOT_DEFAULT
+    video = cv2.VideoCapture(indice_camera)
+    if not video.isOpened():
+        logging.error(f"Impossibile aprire /dev/video{indice_camera}")
+        sys.exit(1)
+    # Un solo buffer V4L2: si pubblica sempre il frame più recente
+    video.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+
+    ok, frame = video.read()
+    if not ok:
+        logging.error("Nessun frame dalla telecamera")
+        sys.exit(1)
+
+    shm = FrameShm(NOME_SHM_DEFAULT, frame.shape[:2], n_slot)
+    logging.info(f"Pubblicazione frame su /dev/shm/{NOME_SHM_DEFAULT} {shm.shape}")
+
+    try:
+        while ok:
+            shm.scrivi(frame)
+            ok, frame = video.read()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        video.release()
+        shm.chiudi()
@@ -148,7 +148,7 @@ def curv_ch(image_output,contour):
     sign_changes = np.where(np.diff(np.sign(curvature)))[0]
 
     for s in sign_changes:
-        logging.debug(f"sign:{contour[s - 1]}")
+        logging.debug("sign:%s", contour[s - 1])
         try:
             disegna_pallino(image_output, (contour[s-1][0],contour[s-1][1]), 2, 'red', -1)
         except:
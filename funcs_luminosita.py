@@ -1,9 +1,20 @@
 import numpy as np
 import cv2
 
-from utils import disegna_rettangolo, get_colore
+from utils import disegna_rettangolo, get_colore, njit
 import logging
 
+# Stile testo debug
+_FONT_DEBUG = cv2.FONT_HERSHEY_COMPLEX_SMALL
+_COL_GREEN = get_colore('green')
+
+
+@njit(cache=True, nogil=True)
+def compute_lux_offsets(lux_sft_x, lux_sft_y, crop_w, crop_h):
+    """Offset (sft_x, sft_y) del quadrato lux, in pixel di crop (config in 160esimi)."""
+    return lux_sft_x * crop_w / 160, lux_sft_y * crop_h / 160
+
+
 def calcola_px_lux(image_input, image_output, point, offset, dim, cache, tipo_faro):
     x0 = int(point[0] + offset[0] - dim[0] / 2)
     x1 = int(point[0] + offset[0] + dim[0] / 2)
@@ -14,22 +25,23 @@ def calcola_px_lux(image_input, image_output, point, offset, dim, cache, tipo_fa
 
     zone = image_input[y0:y1, x0:x1]
 
-    if len(zone) == 0:
+    if zone.size == 0:
         return 0
 
     g = cache['config']['cam_g']
     t = cache['config']['exposure_absolute']
     c = cache['config']['cam_c']
     a = 255 - c
-    r = np.mean(zone)
+    # Frame grayscale (buffer contiguo): cv2.mean sulla ROI, senza temporanei float
+    r = cv2.mean(zone)[0] if zone.ndim == 2 else np.mean(zone)
 
     l = -(100000/t) * np.log(1 - (r**g / (a * 255**(g-1))) + c/a)
 
-    logging.debug(f"l: {l} r:{r}")
+    logging.debug("l: %s r:%s", l, r)
 
     if cache['DEBUG']:
-        msg = f"max {np.max(zone)}, mean {int(np.mean(zone))}"
-        cv2.putText(image_output, msg, (5, 30), cv2.FONT_HERSHEY_COMPLEX_SMALL, 0.5, get_colore('green'), 1)
+        msg = f"max {np.max(zone)}, mean {int(r)}"
+        cv2.putText(image_output, msg, (5, 30), _FONT_DEBUG, 0.5, _COL_GREEN, 1)
 
     # Calibrazione luminosità: px_lux -> lux reali
     if tipo_faro == 'abbagliante':
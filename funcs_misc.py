@@ -1,13 +1,23 @@
 import cv2
+import numpy as np
 
-from utils import disegna_pallino, disegna_croce
+from utils import (
+    disegna_pallino, disegna_croce, disegna_segmenti,
+    njit, prange, buffer_rotante
+)
 
 
 def preprocess(image_orig, cache):
     config = cache['config']
 
     if 'crop_w' not in config or 'crop_h' not in config:
-        return image_orig, image_orig.copy()
+        # Copia anche senza crop: image_orig può essere uno slot della memoria
+        # condivisa, che il produttore riscrive mentre il frame è ancora in uso
+        image_input = buffer_rotante(cache, 'buf_input', image_orig.shape)
+        np.copyto(image_input, image_orig)
+        image_view = buffer_rotante(cache, 'buf_view', image_orig.shape)
+        np.copyto(image_view, image_input)
+        return image_input, image_view
 
     height, width = image_orig.shape[:2]
     crop_center = config.get('crop_center', [width/2, height/2])
@@ -20,54 +30,55 @@ def preprocess(image_orig, cache):
     start_x = max(int(crop_center[0] - crop_w/2), 0)
     end_x = min(int(crop_center[0] + crop_w/2), width)
 
-    # Crop effettivo
-    image_input = image_orig[start_y:end_y, start_x:end_x].copy()
-    image_view = cv2.convertScaleAbs(image_input, alpha=1.0, beta=20)
+    # Crop effettivo, copiato in buffer preallocati (anello: più frame in volo)
+    crop = image_orig[start_y:end_y, start_x:end_x]
+    image_input = buffer_rotante(cache, 'buf_input', crop.shape)
+    np.copyto(image_input, crop)
+    image_view = cv2.convertScaleAbs(image_input, alpha=1.0, beta=20,
+                                     dst=buffer_rotante(cache, 'buf_view', crop.shape))
 
     return image_input, image_view
 
 
-def is_punto_ok(point, cache):
-    """
-    Verifica se il punto è dentro la croce di riferimento e fornisce indicazioni direzionali.
+# LUT COLORMAP_JET (256, 3) BGR, identica a cv2.applyColorMap
+JET_LUT = cv2.applyColorMap(
+    np.arange(256, dtype=np.uint8).reshape(1, 256), cv2.COLORMAP_JET
+).reshape(256, 3)
 
-    Args:
-        point: Tuple (x, y) con coordinate del punto
-        cache: Dizionario con config e stato_comunicazione
 
-    Returns:
-        Dict con:
-        - 'ok': bool - True se punto dentro la croce
-        - 'left': int - 0=ok, 1=poco fuori sx (entro 2×TOH), 2=molto fuori sx
-        - 'right': int - 0=ok, 1=poco fuori dx (entro 2×TOH), 2=molto fuori dx
-        - 'up': int - 0=ok, 1=poco fuori su (entro 2×TOV), 2=molto fuori su
-        - 'down': int - 0=ok, 1=poco fuori giù (entro 2×TOV), 2=molto fuori giù
-        - 'status': str - 'ok', 'warning' (poco fuori), 'error' (molto fuori)
+@njit(parallel=True, cache=True, nogil=True)
+def fuse_gray_jet(image_input, image_view, out_gray, out_view, lut):
     """
-    stato_comunicazione = cache['stato_comunicazione']
-    config = cache["config"]
-    width = config["width"]
-    height = config["height"]
-
-    # Prendi TOV e TOH: prima da comunicazione, poi da config
-    # Comunicazione ha priorità per permettere aggiustamenti real-time
-    toh = int(stato_comunicazione.get('TOH', config.get('TOH', 50)))
-    tov = int(stato_comunicazione.get('TOV', config.get('TOV', 50)))
-    inclinazione = int(stato_comunicazione.get('incl', 0))
-
-    # Centro della croce
-    center_x = width / 2
-    center_y = height / 2 + inclinazione
+    Pattern 2 in un solo passaggio sui pixel: out_gray = BGR2GRAY(image_input)
+    e out_view = JET(BGR2GRAY(image_view)). Gli ingressi possono essere view
+    con stride negativo (flip), così anche il flip non costa un passaggio.
+    Coefficienti a 15 bit come cv2.cvtColor: risultato identico a OpenCV.
+    Da usare solo con numba (NUMBA_DISPONIBILE), altrimenti è Python puro.
+    """
+    h, w = out_gray.shape
+    for y in prange(h):
+        for x in range(w):
+            g = (int(image_input[y, x, 0]) * 3735 + int(image_input[y, x, 1]) * 19235
+                 + int(image_input[y, x, 2]) * 9798 + 16384) >> 15
+            out_gray[y, x] = g
+            v = (int(image_view[y, x, 0]) * 3735 + int(image_view[y, x, 1]) * 19235
+                 + int(image_view[y, x, 2]) * 9798 + 16384) >> 15
+            out_view[y, x, 0] = lut[v, 0]
+            out_view[y, x, 1] = lut[v, 1]
+            out_view[y, x, 2] = lut[v, 2]
+
+
+@njit(cache=True, nogil=True)
+def _punto_ok_kernel(px, py, cx, cy, toh, tov):
+    """
+    Calcola le indicazioni direzionali (left, right, up, down) di is_punto_ok
+    su soli scalari, compilabile con numba.
 
+    3 = ok (centro), 2 = fuori, 1 = molto fuori, 0 = direzione opposta
+    """
     # Distanze dal centro
-    dx = point[0] - center_x
-    dy = point[1] - center_y
-
-    # Verifica se dentro la croce
-    is_inside = abs(dx) <= toh and abs(dy) <= tov
-
-    # Calcola indicazioni direzionali con 3 livelli
-    # 3 = ok (centro), 2 = fuori, 1 = molto fuori, 0 = direzione opposta
+    dx = px - cx
+    dy = py - cy
 
     # Orizzontale (left/right)
     if dx < -toh:
@@ -109,6 +120,48 @@ def is_punto_ok(point, cache):
         up = 3
         down = 3
 
+    return left, right, up, down
+
+
+def is_punto_ok(point, cache):
+    """
+    Verifica se il punto è dentro la croce di riferimento e fornisce indicazioni direzionali.
+
+    Args:
+        point: Tuple (x, y) con coordinate del punto
+        cache: Dizionario con config e stato_comunicazione
+
+    Returns:
+        Dict con:
+        - 'ok': bool - True se punto dentro la croce
+        - 'left': int - 0=ok, 1=poco fuori sx (entro 2×TOH), 2=molto fuori sx
+        - 'right': int - 0=ok, 1=poco fuori dx (entro 2×TOH), 2=molto fuori dx
+        - 'up': int - 0=ok, 1=poco fuori su (entro 2×TOV), 2=molto fuori su
+        - 'down': int - 0=ok, 1=poco fuori giù (entro 2×TOV), 2=molto fuori giù
+        - 'status': str - 'ok', 'warning' (poco fuori), 'error' (molto fuori)
+    """
+    stato_comunicazione = cache['stato_comunicazione']
+    config = cache["config"]
+    width = config["width"]
+    height = config["height"]
+
+    # Prendi TOV e TOH: prima da comunicazione, poi da config
+    # Comunicazione ha priorità per permettere aggiustamenti real-time
+    toh = int(stato_comunicazione.get('TOH', config.get('TOH', 50)))
+    tov = int(stato_comunicazione.get('TOV', config.get('TOV', 50)))
+    inclinazione = int(stato_comunicazione.get('incl', 0))
+
+    # Centro della croce
+    center_x = width / 2
+    center_y = height / 2 + inclinazione
+
+    left, right, up, down = _punto_ok_kernel(
+        float(point[0]), float(point[1]), center_x, center_y, toh, tov
+    )
+
+    # Verifica se dentro la croce
+    is_inside = left == 3 and up == 3
+
     # Determina status generale (ignora 0 che è direzione opposta)
     levels = [v for v in [left, right, up, down] if v > 0]
     min_level = min(levels) if levels else 3
@@ -129,9 +182,18 @@ def is_punto_ok(point, cache):
     }
 
 
+def segmenti_croce_riferimento(x, y, width, heigth, larghezza=1000):
+    # Due croci (angoli opposti del riquadro di tolleranza): 4 segmenti
+    segmenti = []
+    for cx, cy in ((x - width / 2, y - heigth / 2), (x + width / 2, y + heigth / 2)):
+        segmenti.append(((cx - larghezza, cy), (cx + larghezza, cy)))
+        segmenti.append(((cx, cy - larghezza), (cx, cy + larghezza)))
+    return segmenti
+
+
 def visualizza_croce_riferimento(frame, x, y, width, heigth):
-    disegna_croce(frame, (x - width / 2, y - heigth / 2), 1000, 1, 'green')
-    disegna_croce(frame, (x + width / 2, y + heigth / 2), 1000, 1, 'green')
+    disegna_segmenti(frame, segmenti_croce_riferimento(x, y, width, heigth), 1, 'green')
+
 
 def point_in_rect(pt, rect):
     x, y = pt
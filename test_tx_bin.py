@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Test formato TX binario (USE_NEW_FORMAT = 'bin'): uno stream con un idle
+seguito da un dato deve dividersi in record da 28 byte decodificabili.
+"""
+
+import math
+import sys
+sys.path.insert(0, '/home/user/centrafari')
+
+import comms
+
+
+def test_stream_idle_poi_dato():
+    formato = comms.USE_NEW_FORMAT
+    comms.USE_NEW_FORMAT = 'bin'
+    try:
+        cache = {'config': {'width': 630, 'height': 320}, 'stato_comunicazione': {}}
+        dato = {
+            'posiz_pattern_x': 315.0, 'posiz_pattern_y': 160.0, 'px_lux': 12.5,
+            'roll': 1.0, 'yaw': -2.0, 'pitch': 0.5,
+            'left': 3, 'right': 3, 'up': 0, 'down': 1,
+        }
+        stream = comms.messaggio_tx(None, cache) + comms.messaggio_tx(dato, cache)
+    finally:
+        comms.USE_NEW_FORMAT = formato
+
+    assert len(stream) == 2 * comms._TX_BIN.size
+    idle, rec = comms._TX_BIN.iter_unpack(stream)
+
+    # Idle: float NaN, indicatori a 0
+    assert all(math.isnan(v) for v in idle[:6])
+    assert idle[6:] == (0, 0, 0, 0)
+
+    # Dato: centro immagine -> x, y = 0 (percentuale), resto invariato
+    assert rec[:6] == (0.0, 0.0, 12.5, 1.0, -2.0, 0.5)
+    assert rec[6:] == (3, 3, 0, 1)
+
+
+def test_idle_testo():
+    # Formato testo invariato
+    assert comms.messaggio_tx(None) == b"idle "
+
+
+if __name__ == "__main__":
+    test_stream_idle_poi_dato()
+    test_idle_testo()
+    print("OK")
@@ -2,28 +2,49 @@ import cv2
 import numpy as np
 import subprocess
 import bisect
+import queue
+import json
+import os
+
+# orjson opzionale: parsing JSON più veloce, fallback su json standard
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Numba opzionale: senza numba i kernel restano funzioni Python
+try:
+    from numba import njit, prange
+    NUMBA_DISPONIBILE = True
+except ImportError:
+    NUMBA_DISPONIBILE = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda f: f
+
+
+# Tabella colori (RGB come usati nei disegni), un solo lookup per chiamata
+_COLORI = {
+    "red": (255, 0, 0),
+    "yellow": (255, 255, 0),
+    "green": (0, 255, 0),
+    "blue": (0, 0, 255),
+    "gold": (255, 215, 0),
+    "cyan": (0, 255, 255),
+    "saddlebrown": (139, 69, 19),
+    "white": (255, 255, 255),
+    "black": (0, 0, 0),
+}
 
 
 def get_colore(colore: str):
-    if colore == "red":
-        return (255, 0, 0)
-    if colore == "yellow":
-        return (255, 255, 0)
-    if colore == "green":
-        return (0, 255, 0)
-    if colore == "blue":
-        return (0, 0, 255)
-    if colore == "gold":
-        return (255, 215, 0)
-    if colore == "cyan":
-        return (0, 255, 255)
-    if colore == "saddlebrown":
-        return (139, 69, 19)
-    if colore == "white":
-        return (255, 255, 255)
-    if colore == "black":
-        return (0, 0, 0)
-    raise ValueError()
+    try:
+        return _COLORI[colore]
+    except KeyError:
+        raise ValueError(colore) from None
 
 
 def get_colore_bgr(colore: str):
@@ -71,6 +92,22 @@ def disegna_croce(frame, punto, larghezza, spessore, colore):
     )
 
 
+def disegna_segmenti(frame, segmenti, spessore, colore):
+    """
+    Disegna più segmenti [(punto1, punto2), ...] con un'unica cv2.polylines
+    (stesso risultato di disegna_segmento chiamata per ciascuno).
+    """
+    pts = np.array(segmenti, dtype=np.float64).astype(np.int32).reshape(-1, 2, 2)
+    cv2.polylines(frame, pts, False, get_colore(colore), spessore, cv2.LINE_AA)
+
+
+def disegna_segmenti_planare(piani, segmenti, spessore, colore):
+    """Come disegna_segmenti ma su immagine a piani separati."""
+    pts = np.array(segmenti, dtype=np.float64).astype(np.int32).reshape(-1, 2, 2)
+    for piano, valore in zip(piani, get_colore(colore)):
+        cv2.polylines(piano, pts, False, valore, spessore, cv2.LINE_AA)
+
+
 def disegna_croci(frame, punti, larghezza, spessore, colore):
     for punto in punti:
         disegna_croce(frame, punto, larghezza, spessore, colore)
@@ -146,3 +183,120 @@ def angolo_esterno_vettori(v1, v2):
 
 def uccidi_processo(cmd):
     subprocess.Popen(f"echo 1234 | sudo -S pkill -15 -f '{cmd}'", shell=True)
+
+
+def metti_ultimo(coda, elemento):
+    """
+    Inserisce in una coda limitata scartando l'elemento più vecchio se piena
+    (latest-wins: il consumatore trova sempre il dato più recente).
+    """
+    while True:
+        try:
+            coda.put_nowait(elemento)
+            return
+        except queue.Full:
+            try:
+                coda.get_nowait()
+            except queue.Empty:
+                pass
+
+
+# Frame contemporaneamente in uso nella pipeline MW28912 (acquisizione,
+# coda_frame, elaborazione, coda_display, GUI) più margine: dimensione di
+# default degli anelli di buffer preallocati
+BUFFER_IN_VOLO = 8
+
+
+def buffer_rotante(cache, chiave, shape, dtype=np.uint8, n=BUFFER_IN_VOLO):
+    """
+    Ritorna il prossimo di n buffer preallocati (anello in cache[chiave]),
+    da usare come dst= delle funzioni OpenCV al posto di un'allocazione per frame.
+
+    n deve coprire i frame contemporaneamente in uso nella pipeline: un buffer
+    viene riutilizzato solo dopo altri n-1 frame. L'anello viene riallocato
+    se cambiano shape o dtype.
+    """
+    anello = cache.get(chiave)
+    if anello is None or anello['buf'][0].shape != tuple(shape) or anello['buf'][0].dtype != dtype:
+        anello = {'buf': [np.empty(shape, dtype=dtype) for _ in range(n)], 'i': 0}
+        cache[chiave] = anello
+    i = anello['i']
+    anello['i'] = (i + 1) % len(anello['buf'])
+    return anello['buf'][i]
+
+
+def carica_json(filepath):
+    """Legge un file JSON (orjson se disponibile, altrimenti json standard)."""
+    with open(filepath, "rb") as f:
+        dati = f.read()
+    if orjson is not None:
+        return orjson.loads(dati)
+    return json.loads(dati)
+
+
+def _json_numpy(obj):
+    """Fallback di json.dumps per scalari e array numpy."""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    raise TypeError(f"{type(obj).__name__} non serializzabile in JSON")
+
+
+def salva_json(filepath, dati):
+    """
+    Scrive un dict su file JSON indentato (orjson se disponibile, altrimenti
+    json standard). Gli scalari numpy sono serializzati come numeri.
+
+    Scrittura atomica: file temporaneo nella stessa directory e os.replace,
+    così chi legge (thread_config, init_config) non vede mai un file troncato.
+    """
+    # Stesso formato sui due percorsi: indent 2 (l'unico di orjson), UTF-8
+    if orjson is not None:
+        testo = orjson.dumps(dati, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY)
+    else:
+        testo = json.dumps(dati, indent=2, ensure_ascii=False, default=_json_numpy).encode()
+    tmp = filepath + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(testo)
+    os.replace(tmp, filepath)
+
+
+def crea_sprite(canvas):
+    """
+    Ricava uno sprite da un overlay disegnato una volta su fondo nero.
+
+    La copertura di ogni pixel è stimata come massimo sui canali e il canvas
+    è usato come colore premoltiplicato. È esatto solo per colori con un
+    canale a 255 (cyan, yellow, green, white usati dalla calibrazione): un
+    colore più scuro come saddlebrown risulterebbe semitrasparente e il nero
+    non è distinguibile dal fondo. Lo sprite è ritagliato al rettangolo dei
+    pixel disegnati.
+
+    Returns:
+        (x0, y0, 255 - alpha (h, w, 3), colore premoltiplicato (h, w, 3)), uint8,
+        oppure None se il canvas è vuoto
+    """
+    alpha = canvas.max(axis=2)
+    x0, y0, w, h = cv2.boundingRect(alpha)
+    if w == 0 or h == 0:
+        return None
+    inv_alpha = cv2.merge([255 - alpha[y0:y0 + h, x0:x0 + w]] * 3)
+    return x0, y0, inv_alpha, canvas[y0:y0 + h, x0:x0 + w].copy()
+
+
+def componi_sprite(frame, sprite):
+    """
+    Compone sul frame BGR uno sprite creato da crea_sprite:
+    frame = frame * (255 - alpha) / 255 + colore premoltiplicato, in place
+    sul solo rettangolo dello sprite.
+    """
+    if sprite is None:
+        return
+    x0, y0, inv_alpha, col = sprite
+    h, w = inv_alpha.shape[:2]
+    roi = frame[y0:y0 + h, x0:x0 + w]
+    if roi.shape[:2] != (h, w):
+        return
+    cv2.multiply(roi, inv_alpha, dst=roi, scale=1 / 255)
+    cv2.add(roi, col, dst=roi)